@@ -0,0 +1,204 @@
+from urllib.parse import urlparse
+import copy
+import hashlib
+import json
+import os
+
+#tools whose calls are recorded into a trace, in the order the agent made them
+RECORDED_TOOLS = ["Enter-Text", "Bulk-Enter-Text", "Set-Select-Element-Option", "Upload-File", "Click-Button", "Click-HREF-Link"]
+
+#tools that may leave the current page: a trace for a form ends with one of these, and page listings from before one are stale
+PAGE_CHANGING_TOOLS = ["Navigate-to-URL", "Click-Button", "Click-HREF-Link"]
+
+#clicks are never replayed: the recorded click may submit the application, which is left to the agent
+REPLAY_STOP_TOOLS = ["Click-Button", "Click-HREF-Link"]
+
+#registries that identify a form; buttons and links vary too much between postings
+SIGNATURE_CATEGORIES = ["text_input_elements", "select_elements", "file_upload_elements"]
+
+class ActionTraceStore:
+
+    def __init__(self, trace_dir: str = "../traces") -> None:
+
+        self.trace_dir = trace_dir
+
+        os.makedirs(trace_dir, exist_ok=True)
+
+    def get_trace_path(self, signature: str) -> str:
+
+        return os.path.join(self.trace_dir, f"{signature}.json")
+
+    def load(self, signature: str) -> dict:
+
+        trace_path = self.get_trace_path(signature)
+
+        if not os.path.exists(trace_path):
+
+            return None
+
+        with open(trace_path, "r") as f:
+
+            return json.load(f)
+
+    def save(self, signature: str, trace: dict) -> None:
+
+        #write then rename, so concurrent workers never read a half-written trace
+        temp_path = self.get_trace_path(signature) + ".tmp"
+
+        with open(temp_path, "w") as f:
+
+            json.dump(trace, f, indent=4)
+
+        os.replace(temp_path, self.get_trace_path(signature))
+
+class ActionTracer:
+
+    def __init__(self, store: ActionTraceStore, applicant_profile, verbose: bool = False) -> None:
+
+        self.store = store
+        self.applicant_profile = applicant_profile
+        self.verbose = verbose
+
+        #actions recorded in this run, per form signature, not yet written to the store
+        self.recordings = {}
+        self.recording_hosts = {}
+
+    def get_form_signature(self, url: str, registries: dict) -> str:
+
+        field_keys = sorted(f"{category}:{key}" for category in SIGNATURE_CATEGORIES for key in registries[category])
+
+        #pages without form fields (job listings, landing pages) are never traced
+        if len(field_keys) == 0:
+
+            return None
+
+        host = urlparse(url).netloc
+
+        return host.replace(":", "_") + "-" + hashlib.sha1("\n".join(field_keys).encode("utf-8")).hexdigest()[:16]
+
+    def find_profile_field(self, value) -> str:
+
+        if not isinstance(value, str) or not value.strip():
+
+            return None
+
+        normalized_value = value.strip().lower()
+
+        for path, field_value in self.applicant_profile.get_flattened_fields().items():
+
+            if str(field_value).strip().lower() == normalized_value:
+
+                return path
+
+        return None
+
+    def record(self, signature: str, url: str, tool: str, args: dict) -> None:
+
+        if signature is None:
+
+            return
+
+        profile_fields = {}
+
+        if tool == "Enter-Text":
+
+            profile_fields["text"] = self.find_profile_field(args["text"])
+
+        elif tool == "Set-Select-Element-Option":
+
+            profile_fields["option"] = self.find_profile_field(args["option"])
+
+        elif tool == "Bulk-Enter-Text":
+
+            args = dict(args, text_input_fields=json.loads(args["text_input_fields"]))
+
+            profile_fields["text_input_fields"] = {field: self.find_profile_field(text) for field, text in args["text_input_fields"].items()}
+
+        self.recordings.setdefault(signature, []).append({"tool": tool, "args": args, "profile_fields": profile_fields})
+        self.recording_hosts[signature] = urlparse(url).netloc
+
+    def get_unmapped_values(self, action: dict) -> list:
+
+        #recorded values that did not come from the profile (names typed differently, free-text answers, guesses)
+        #belong to the applicant they were recorded for, so they are never replayed for anyone
+        unmapped = []
+
+        for arg_name, profile_field in action["profile_fields"].items():
+
+            if isinstance(profile_field, dict):
+
+                unmapped.extend(field for field, path in profile_field.items() if path is None)
+
+            elif profile_field is None:
+
+                unmapped.append(arg_name)
+
+        return unmapped
+
+    def resolve_args(self, action: dict) -> dict:
+
+        #recorded values that came from the profile are re-read from the current applicant's profile
+        fields = self.applicant_profile.get_flattened_fields()
+
+        args = copy.deepcopy(action["args"])
+
+        for arg_name, profile_field in action["profile_fields"].items():
+
+            if isinstance(profile_field, dict):
+
+                for field, path in profile_field.items():
+
+                    if path is not None:
+
+                        if path not in fields:
+
+                            return None
+
+                        args[arg_name][field] = str(fields[path])
+
+            elif profile_field is not None:
+
+                if profile_field not in fields:
+
+                    return None
+
+                args[arg_name] = str(fields[profile_field])
+
+        if action["tool"] == "Bulk-Enter-Text":
+
+            args["text_input_fields"] = json.dumps(args["text_input_fields"])
+
+        return args
+
+    def load(self, signature: str) -> dict:
+
+        if signature is None:
+
+            return None
+
+        return self.store.load(signature)
+
+    def restart_recording(self, signature: str, url: str, actions: list) -> None:
+
+        #after a divergence, the replayed prefix is kept and the agent's actions are appended to it
+        self.recordings[signature] = list(actions)
+        self.recording_hosts[signature] = urlparse(url).netloc
+
+    def flush(self, signature: str = None) -> None:
+
+        signatures = list(self.recordings.keys()) if signature is None else [signature]
+
+        for signature in signatures:
+
+            actions = self.recordings.pop(signature, [])
+            host = self.recording_hosts.pop(signature, None)
+
+            if len(actions) == 0:
+
+                continue
+
+            self.store.save(signature, {"signature": signature, "host": host, "actions": actions})
+
+            if self.verbose:
+
+                print(f"Saved action trace {signature} with {len(actions)} action(s).")
@@ -1,26 +1,30 @@
-import langchain
-import langchain.agents as LangChainAgents
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_community.callbacks.manager import get_openai_callback
 from langchain.agents.output_parsers.openai_tools import OpenAIToolsAgentOutputParser
 from langchain.agents.format_scratchpad.openai_tools import format_to_openai_tool_messages
-from extendedchatopenai import ExtendedChatOpenAI
+from langchain.agents.agent import RunnableMultiActionAgent
 from selenium_engine import SeleniumEngine
 from applicant_profile import ApplicantProfile
+from blocking_executor import BlockingCallExecutor
+from scratchpad import ScratchpadCompactor
+from action_trace import ActionTracer, ActionTraceStore
+from field_matcher import ProfileFieldMatcher
+from profile_store import ProfileStore
+from tracing import Tracer, TracingCallbackHandler
+from tool_schemas import get_openai_tools
+from tool_scheduler import SchedulingAgentExecutor
 import argparse
 
+#the output of an agent that reached max_iterations before finishing
+ITERATION_LIMIT_OUTPUT = "Agent stopped due to iteration limit or time limit."
+
 class AppBot:
 
-    def __init__(self, verbose: bool = False, applicant_id: str = None):
+    def __init__(self, verbose: bool = False, applicant_id: str = None, driver = None, blocking_executor: BlockingCallExecutor = None, llm_cache_path: str = None, replay_only: bool = False, scratchpad_token_limit: int = 12000, trace_dir: str = None, autofill: bool = False, profile_store: ProfileStore = None, trace_output: str = None, llm = None, small_model: str = None, token_budget: int = None, cost_budget: float = None, llm_base_url: str = None):
 
         self.applicant_id = applicant_id
         
-        #LLM
-        self.llm = ExtendedChatOpenAI(
-            model="gpt-4o", 
-            api_key_filename="openai_api_key.txt", 
-            temperature=0
-        )
+        #LLM; a stand-in chat model can be passed for offline runs
+        self.llm = llm if llm is not None else self.create_llm(llm_cache_path, replay_only, small_model, token_budget, cost_budget, llm_base_url)
 
         self.agent_prompt = ChatPromptTemplate.from_messages([
             ("system", 
@@ -37,21 +41,46 @@ class AppBot:
             MessagesPlaceholder(variable_name="agent_scratchpad")
         ])
 
-        #selenium agent
-        self.selenium_engine = SeleniumEngine(verbose=verbose, file_upload_source_path=f"../applicants/{self.applicant_id}/")
-        
+        #per-step spans for LLM calls, tools and element refreshes, written to trace_output after a run
+        self.trace_output = trace_output
+        self.tracer = Tracer() if trace_output is not None else None
+
+        #keeps the scratchpad from growing with every step of a long run
+        self.scratchpad_compactor = ScratchpadCompactor(max_tokens=scratchpad_token_limit, verbose=verbose)
+
         #applicant profile
-        self.applicant_profile = ApplicantProfile(applicantID=self.applicant_id)
+        self.applicant_profile = ApplicantProfile(applicantID=self.applicant_id, blocking_executor=blocking_executor, profile_store=profile_store)
+
+        #recorded form traces are replayed without the LLM when a known form is seen again
+        self.action_tracer = ActionTracer(ActionTraceStore(trace_dir), self.applicant_profile, verbose=verbose) if trace_dir is not None else None
+
+        #text inputs that clearly match a profile field are filled without consulting the LLM
+        self.field_matcher = ProfileFieldMatcher(self.applicant_profile) if autofill else None
+
+        #selenium agent
+        self.selenium_engine = SeleniumEngine(
+            verbose=verbose, 
+            file_upload_source_path=f"../applicants/{self.applicant_id}/", 
+            driver=driver, 
+            blocking_executor=blocking_executor, 
+            action_tracer=self.action_tracer,
+            field_matcher=self.field_matcher,
+            document_resolver=self.applicant_profile.get_document_path,
+            tracer=self.tracer
+        )
+
+        self.callbacks = [TracingCallbackHandler(self.tracer, self.selenium_engine)] if self.tracer is not None else []
 
         all_tools = self.selenium_engine.get_tools() + self.applicant_profile.get_tools()
 
-        self.agent_llm = self.llm.bind_tools(all_tools)
+        #the same tool definitions bind_tools would build, converted once per process instead of per AppBot
+        self.agent_llm = self.llm.bind(tools=get_openai_tools(all_tools))
 
         self.agent = (
             {
                 "input": lambda x: x["input"],
                 "agent_scratchpad": lambda x: format_to_openai_tool_messages(
-                    x["intermediate_steps"]
+                    self.scratchpad_compactor(x["intermediate_steps"])
                 ),
             }
             | self.agent_prompt
@@ -59,24 +88,180 @@ class AppBot:
             | OpenAIToolsAgentOutputParser()
         )
 
-        self.agent_executor = LangChainAgents.AgentExecutor(agent=self.agent, tools=all_tools, verbose=verbose, max_iterations=100)
+        #tool calls of a step run in the order the LLM gave them, with one refresh after each run of adjacent mutating calls
+        #streaming would call the chat model's _stream, which bypasses the LLM cache
+        self.agent_executor = SchedulingAgentExecutor(agent=RunnableMultiActionAgent(runnable=self.agent, stream_runnable=False), tools=all_tools, verbose=verbose, max_iterations=100, selenium_engine=self.selenium_engine)
+
+    @staticmethod
+    def create_llm(llm_cache_path: str = None, replay_only: bool = False, small_model: str = None, token_budget: int = None, cost_budget: float = None, llm_base_url: str = None):
+
+        #the OpenAI client stack is only imported when it is used
+        from extendedchatopenai import ExtendedChatOpenAI
+
+        #an OpenAI-compatible server at llm_base_url, e.g. a local stand-in, serves every model
+        options = {"base_url": llm_base_url} if llm_base_url is not None else {}
+
+        if small_model is None and token_budget is None and cost_budget is None:
+
+            return ExtendedChatOpenAI(
+                model="gpt-4o", 
+                api_key_filename="openai_api_key.txt", 
+                temperature=0,
+                cache_path=llm_cache_path,
+                replay_only=replay_only,
+                **options
+            )
+
+        from model_router import ModelRouter
+        from llm_cache import PersistentLLMCache
+
+        #routine steps go to the small model, and the router enforces the budgets; responses are cached per pair of models
+        return ModelRouter(
+            large_model=ExtendedChatOpenAI(model="gpt-4o", api_key_filename="openai_api_key.txt", temperature=0, **options),
+            small_model=ExtendedChatOpenAI(model=small_model, api_key_filename="openai_api_key.txt", temperature=0, **options) if small_model is not None else None,
+            token_budget=token_budget,
+            cost_budget=cost_budget,
+            cache=PersistentLLMCache(database_path=llm_cache_path, replay_only=replay_only) if llm_cache_path is not None else None
+        )
+
+    def invoke_agent(self, input_text: str) -> dict:
 
-    def invoke_agent(self, input_text: str) -> None:
+        from langchain_community.callbacks.manager import get_openai_callback
 
         with get_openai_callback() as openai_callback:
 
-            self.agent_executor.invoke({"input": input_text})
+            try:
+
+                outputs = self.agent_executor.invoke({"input": input_text}, config={"callbacks": self.callbacks})
+
+            finally:
+
+                self.selenium_engine.flush_action_trace()
+
+                self.write_trace()
+
+            usage = self.report_usage(openai_callback)
+
+            usage["stopped_early"] = outputs.get("output") == ITERATION_LIMIT_OUTPUT
+
+            return usage
+
+    async def ainvoke_agent(self, input_text: str) -> dict:
+
+        from langchain_community.callbacks.manager import get_openai_callback
+
+        with get_openai_callback() as openai_callback:
+
+            try:
+
+                outputs = await self.agent_executor.ainvoke({"input": input_text}, config={"callbacks": self.callbacks})
+
+            finally:
+
+                self.selenium_engine.flush_action_trace()
+
+                self.write_trace()
+
+            usage = self.report_usage(openai_callback)
+
+            usage["stopped_early"] = outputs.get("output") == ITERATION_LIMIT_OUTPUT
+
+            return usage
+
+    def write_trace(self) -> None:
+
+        if self.tracer is None:
+
+            return
+
+        self.tracer.write_jsonl(self.trace_output + ".jsonl")
+        self.tracer.write_chrome_trace(self.trace_output + ".chrome.json")
+
+        print(self.tracer.format_summary())
+        print(f"Trace written to {self.trace_output}.jsonl and {self.trace_output}.chrome.json")
+
+    def report_usage(self, openai_callback) -> dict:
         
-            print("Agent Execution Complete.")
-            print("Total Tokens Used: ", openai_callback.total_tokens)
-            print("Prompt Tokens Used: ", openai_callback.prompt_tokens)
-            print("Completion Tokens Used: ", openai_callback.completion_tokens)
-            print("Total Cost: ", openai_callback.total_cost)
+        print("Agent Execution Complete.")
+        print("Total Tokens Used: ", openai_callback.total_tokens)
+        print("Prompt Tokens Used: ", openai_callback.prompt_tokens)
+        print("Completion Tokens Used: ", openai_callback.completion_tokens)
+        print("Total Cost: ", openai_callback.total_cost)
+
+        usage = {
+            "total_tokens": openai_callback.total_tokens,
+            "prompt_tokens": openai_callback.prompt_tokens,
+            "completion_tokens": openai_callback.completion_tokens,
+            "total_cost": openai_callback.total_cost
+        }
+
+        autofill_reports = self.selenium_engine.autofill_reports
+
+        if autofill_reports:
+
+            autofill_fields = sum(report["fields"] for report in autofill_reports)
+            autofill_matched = sum(report["matched"] for report in autofill_reports)
+
+            print("Autofill Match Rate: ", autofill_matched / autofill_fields if autofill_fields else 0.0)
+            print("LLM Iterations Avoided: ", sum(report["llm_iterations_avoided"] for report in autofill_reports))
+
+            usage["autofill_forms"] = autofill_reports
+
+        cache_stats = self.llm.get_cache_stats() if hasattr(self.llm, "get_cache_stats") else {}
+
+        if cache_stats:
+
+            print("LLM Cache Hits: ", cache_stats["hits"])
+            print("LLM Cache Misses: ", cache_stats["misses"])
+
+            usage.update({"llm_cache_" + key: value for key, value in cache_stats.items()})
+
+        routing_stats = self.llm.get_routing_stats() if hasattr(self.llm, "get_routing_stats") else {}
+
+        if routing_stats:
+
+            print("Small Model Calls: ", routing_stats["small_calls"])
+            print("Large Model Calls: ", routing_stats["large_calls"])
+            print("Escalations: ", routing_stats["escalations"])
+
+            usage.update({"routing_" + key: value for key, value in routing_stats.items()})
+
+        text_stats = self.selenium_engine.get_text_stats()
+
+        if text_stats:
+
+            print("Page Text Tokens Saved: ", text_stats["saved_tokens"])
+
+            usage.update({"page_" + key: value for key, value in text_stats.items()})
+
+        settle_stats = self.selenium_engine.get_settle_stats()
+
+        if settle_stats:
+
+            print("Page Settle Time: ", settle_stats["total_seconds"])
+            print("Actions Not Settled: ", settle_stats["unsettled"])
+
+            usage["settle_reports"] = self.selenium_engine.settle_reports
+
+        return usage
 
 if __name__ == "__main__":
 
     parser = argparse.ArgumentParser()
     parser.add_argument("-c", "--text", help="Some text")
+    parser.add_argument("--applicant", default="example_applicant", help="Applicant to apply as, a folder in ../applicants")
+    parser.add_argument("--llm-cache", help="Path of a SQLite file used to cache LLM responses")
+    parser.add_argument("--replay-only", action="store_true", help="Only use cached LLM responses and fail on a cache miss")
+    parser.add_argument("--trace-dir", help="Directory of recorded form traces to record into and replay from")
+    parser.add_argument("--autofill", action="store_true", help="Fill text inputs that match applicant profile fields without the LLM")
+    parser.add_argument("--trace-output", help="Path prefix for a JSONL and Chrome-trace timeline of the run")
+    parser.add_argument("--record-driver", help="Record every WebDriver call of the run to this file")
+    parser.add_argument("--replay-driver", help="Serve WebDriver calls from a recording instead of launching chrome")
+    parser.add_argument("--lightweight", action="store_true", help="Run a headless browser without extensions, images, fonts, media or trackers")
+    parser.add_argument("--small-model", help="Send routine steps to this cheaper model, escalating to gpt-4o on errors and ambiguous responses")
+    parser.add_argument("--token-budget", type=int, help="Stop the application once its LLM calls used this many tokens")
+    parser.add_argument("--cost-budget", type=float, help="Stop the application once its LLM calls cost this many dollars")
+    parser.add_argument("--llm-base-url", help="Base URL of an OpenAI-compatible server to send LLM calls to, e.g. a local stand-in")
     args = parser.parse_args()
 
     if args.text:
@@ -87,5 +272,19 @@ if __name__ == "__main__":
 
         input_text = "Use the tools available to you to fill out job applications."
 
-    appbot = AppBot(verbose=True, applicant_id="sjaskowski")
+    driver = None
+
+    if args.replay_driver:
+
+        driver = SeleniumEngine.create_driver(backend="replay", recording_path=args.replay_driver)
+
+    elif args.record_driver:
+
+        driver = SeleniumEngine.create_driver(backend="record", recording_path=args.record_driver, lightweight=args.lightweight)
+
+    elif args.lightweight:
+
+        driver = SeleniumEngine.create_driver(lightweight=True)
+
+    appbot = AppBot(verbose=True, applicant_id=args.applicant, driver=driver, llm_cache_path=args.llm_cache, replay_only=args.replay_only, trace_dir=args.trace_dir, autofill=args.autofill, trace_output=args.trace_output, small_model=args.small_model, token_budget=args.token_budget, cost_budget=args.cost_budget, llm_base_url=args.llm_base_url)
     appbot.invoke_agent(input_text)
\ No newline at end of file
@@ -1,23 +1,37 @@
 import json
-from langchain.agents import tool
-from langchain.tools import StructuredTool
-from langchain.pydantic_v1 import Field, create_model
+import re
+from langchain_core.tools import StructuredTool
+from tool_schemas import get_args_schema
+from blocking_executor import BlockingCallExecutor, default_executor
+from profile_store import FilesystemProfileStore, ProfileStore
 
 class ApplicantProfile:
 
     tools = []
     
-    def __init__(self, applicantID: str):
+    def __init__(self, applicantID: str, blocking_executor: BlockingCallExecutor = None, profile_store: ProfileStore = None):
 
-        self.applicantID = applicantID
-        self.applicant_json = self.load_applicant_json()
+        self.blocking_executor = blocking_executor if blocking_executor is not None else default_executor
+
+        #profiles are loaded through the store, which keeps recently used ones in memory
+        self.profile_store = profile_store if profile_store is not None else FilesystemProfileStore()
+
+        self.switch_applicant(applicantID)
 
         self.tools = [
             self.create_tool(
                 self.get_applicant_json,
                 name="Get-Applicant-JSON",
                 desc="Get information about the current applicant in json format.",
-                tool_args={}
+                tool_args={},
+                read_only=True
+            ),
+            self.create_tool(
+                self.query_applicant_profile,
+                name="Query-Applicant-Profile",
+                desc="Look up specific information about the current applicant. Provide a comma separated list of field paths (e.g. `contactInfo.email`, `contactInfo.address`) or keywords (e.g. `phone`, `zip code`). Prefer this over Get-Applicant-JSON when only a few fields are needed.",
+                tool_args={"query": str},
+                read_only=True
             )
         ]
 
@@ -25,24 +39,173 @@ class ApplicantProfile:
 
         return self.tools
 
-    def load_applicant_json(self) -> dict:
+    def switch_applicant(self, applicantID: str) -> None:
+
+        self.applicantID = applicantID
+        self.applicant_json = self.load_applicant_json()
+        self.flattened_fields = None
+
+        #keyword -> profile paths, and path -> serialized subtree; built on first query
+        self.keyword_index = None
+        self.fragment_cache = {}
+
+    def get_document_path(self, document: str) -> str:
+
+        return self.profile_store.get_document_path(self.applicantID, document)
+
+    def get_flattened_fields(self) -> dict:
+
+        if self.flattened_fields is None:
+
+            self.flattened_fields = self.flatten(self.applicant_json)
+
+        return self.flattened_fields
+
+    def flatten(self, value, path: str = "") -> dict:
+
+        if isinstance(value, dict):
+
+            items = value.items()
+
+        elif isinstance(value, list):
+
+            items = enumerate(value)
+
+        else:
+
+            return {path: value}
+
+        flattened = {}
+
+        for key, child in items:
+
+            flattened.update(self.flatten(child, f"{path}.{key}" if path else str(key)))
+
+        return flattened
+
+    def tokenize(self, text: str) -> set:
+
+        text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", str(text))
+
+        return {word for word in re.split(r"[^a-zA-Z0-9]+", text.lower()) if word}
+
+    def get_keyword_index(self) -> dict:
+
+        if self.keyword_index is None:
+
+            self.keyword_index = {}
+
+            for path, value in self.get_flattened_fields().items():
+
+                for keyword in self.tokenize(path) | self.tokenize(value):
+
+                    self.keyword_index.setdefault(keyword, set()).add(path)
+
+        return self.keyword_index
+
+    def get_subtree(self, path: str):
+
+        value = self.applicant_json
+
+        for segment in path.split("."):
+
+            if isinstance(value, dict) and segment in value:
 
-        with open(f"../applicants/{self.applicantID}/{self.applicantID}.json", "r") as f:
+                value = value[segment]
 
-            return json.load(f)
+            elif isinstance(value, list) and segment.isdigit() and int(segment) < len(value):
 
-    def create_tool(self, tool_function, name: str = None, desc: str = None, tool_args: dict = None) -> StructuredTool:
+                value = value[int(segment)]
+
+            else:
+
+                raise KeyError(path)
+
+        return value
+
+    def get_fragment(self, path: str) -> str:
+
+        if path not in self.fragment_cache:
+
+            self.fragment_cache[path] = json.dumps(self.get_subtree(path))
+
+        return self.fragment_cache[path]
+
+    def search_fields(self, query: str, limit: int = 5) -> list:
+
+        keyword_index = self.get_keyword_index()
+
+        scores = {}
+
+        for keyword in self.tokenize(query):
+
+            for path in keyword_index.get(keyword, []):
+
+                scores[path] = scores.get(path, 0) + 1
+
+        return sorted(scores, key=lambda path: (-scores[path], path))[:limit]
+
+    def load_applicant_json(self) -> dict:
+
+        return self.profile_store.get_profile(self.applicantID)
+
+    def create_tool(self, tool_function, name: str = None, desc: str = None, tool_args: dict = None, read_only: bool = False) -> StructuredTool:
 
-        pydanticified_args = {description:(arg_type, Field(description=description)) for (description, arg_type) in tool_args.items()}
-        
         return StructuredTool.from_function(
             func=tool_function,
+            coroutine=self.create_tool_coroutine(tool_function),
             name=name,
             description=desc,
-            args_schema=create_model("Model", **pydanticified_args)
+            args_schema=get_args_schema(name, tool_args),
+            metadata={"read_only": read_only}
         )
 
+    def create_tool_coroutine(self, tool_function):
+
+        async def tool_coroutine(**kwargs):
+
+            return await self.blocking_executor.run(tool_function, **kwargs)
+
+        return tool_coroutine
+
     #TOOL FUNC
     def get_applicant_json(self) -> dict:
 
-        return str(self.applicant_json)
\ No newline at end of file
+        if "" not in self.fragment_cache:
+
+            self.fragment_cache[""] = str(self.applicant_json)
+
+        return self.fragment_cache[""]
+
+    #TOOL FUNC
+    def query_applicant_profile(self, query: str) -> str:
+
+        results = []
+
+        for term in [term.strip() for term in query.split(",") if term.strip()]:
+
+            try:
+
+                results.append(f"{term}: {self.get_fragment(term)}")
+
+                continue
+
+            except KeyError:
+
+                pass
+
+            matches = self.search_fields(term)
+
+            if len(matches) == 0:
+
+                results.append(f"{term}: no matching applicant information found.")
+
+            else:
+
+                results.extend(f"{path}: {self.get_fragment(path)}" for path in matches)
+
+        if len(results) == 0:
+
+            return "Provide at least one field path or keyword to look up."
+
+        return "\n".join(results)
\ No newline at end of file
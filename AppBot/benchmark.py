@@ -0,0 +1,333 @@
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from appbot import AppBot
+from selenium_engine import SeleniumEngine
+from profile_store import FilesystemProfileStore
+from scripted_chat_model import ScriptedChatModel
+from browser_tabs import BrowserTabs
+from token_utils import get_encoding
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import functools
+import json
+import os
+import statistics
+import subprocess
+import threading
+import time
+
+BENCHMARK_DIR = "../benchmarks"
+
+#metrics compared against the previous commit's results; lower is better for all of them
+COMPARED_METRICS = ["seconds", "update_elements_seconds", "round_trips", "prompt_tokens"]
+
+class QuietRequestHandler(SimpleHTTPRequestHandler):
+
+    def log_message(self, format, *args) -> None:
+
+        pass
+
+class FixtureServer:
+
+    def __init__(self, forms_dir: str) -> None:
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietRequestHandler, directory=forms_dir))
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+
+        self.thread.start()
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.server.shutdown()
+        self.server.server_close()
+
+class BenchmarkRunner:
+
+    def __init__(self, benchmark_dir: str = BENCHMARK_DIR, driver_factory = None, verbose: bool = False, tolerance: float = 0.2, driver_backend: str = "chrome") -> None:
+
+        self.benchmark_dir = benchmark_dir
+        self.results_path = os.path.join(benchmark_dir, "results.jsonl")
+        self.traces_dir = os.path.join(benchmark_dir, "traces")
+        self.recordings_dir = os.path.join(benchmark_dir, "recordings")
+        self.driver_factory = driver_factory if driver_factory is not None else functools.partial(SeleniumEngine.create_driver, headless=True)
+        self.verbose = verbose
+
+        #"record" saves each scenario's WebDriver calls to the recordings directory, "replay" runs scenarios from them without chrome
+        self.driver_backend = driver_backend
+
+        #relative slowdown of a metric that is reported as a regression
+        self.tolerance = tolerance
+
+        self.profile_store = FilesystemProfileStore(os.path.join(benchmark_dir, "applicants"))
+
+        with open(os.path.join(benchmark_dir, "scenarios.json"), "r") as f:
+
+            self.scenarios = json.load(f)
+
+        os.makedirs(self.traces_dir, exist_ok=True)
+        os.makedirs(self.recordings_dir, exist_ok=True)
+
+        #tiktoken downloads the encoding on first use; loading it here keeps that out of the first scenario's time
+        get_encoding()
+
+    def create_driver(self, scenario: dict):
+
+        if self.driver_backend == "chrome":
+
+            return self.driver_factory()
+
+        return SeleniumEngine.create_driver(headless=True, backend=self.driver_backend, recording_path=os.path.join(self.recordings_dir, f"{scenario['name']}.jsonl"))
+
+    def run_scenario(self, scenario: dict, base_url: str, driver = None) -> dict:
+
+        #a driver passed in belongs to the caller and is left open
+        owns_driver = driver is None
+
+        if owns_driver:
+
+            driver = self.create_driver(scenario)
+
+        try:
+
+            appbot = AppBot(
+                verbose=self.verbose,
+                applicant_id="bench_applicant",
+                driver=driver,
+                profile_store=self.profile_store,
+                trace_output=os.path.join(self.traces_dir, scenario["name"]),
+                llm=ScriptedChatModel(script=scenario["script"], base_url=base_url)
+            )
+
+            start_time = time.perf_counter()
+
+            usage = appbot.invoke_agent("Fill out the job application.")
+
+            seconds = time.perf_counter() - start_time
+
+        finally:
+
+            if owns_driver:
+
+                driver.quit()
+
+        spans = appbot.tracer.spans
+
+        update_spans = [span for span in spans if span["name"] == "update_elements"]
+
+        return {
+            "seconds": seconds,
+            "update_elements_seconds": sum(span["duration"] for span in update_spans),
+            "update_elements_calls": len(update_spans),
+            "settle_seconds": sum(span["duration"] for span in spans if span["name"] == "settle"),
+            "round_trips": appbot.selenium_engine.round_trips,
+            "iterations": sum(1 for span in spans if span["category"] == "agent"),
+            "prompt_tokens": usage["prompt_tokens"],
+            "completion_tokens": usage["completion_tokens"]
+        }
+
+    def run(self, scenario_names: list = None, repeat: int = 1) -> list:
+
+        scenarios = [scenario for scenario in self.scenarios if not scenario_names or scenario["name"] in scenario_names]
+
+        results = []
+
+        with FixtureServer(os.path.join(self.benchmark_dir, "forms")) as server:
+
+            for scenario in scenarios:
+
+                runs = [self.run_scenario(scenario, server.base_url) for _ in range(repeat)]
+
+                #the median run is reported, so one slow browser start does not skew the result
+                result = {metric: statistics.median(run[metric] for run in runs) for metric in runs[0]}
+
+                result["scenario"] = scenario["name"]
+                result["driver_backend"] = self.driver_backend
+                result["repeat"] = repeat
+
+                results.append(result)
+
+        return results
+
+    def run_tab_scaling(self, scenario_name: str, tab_counts: list) -> list:
+
+        #runs tab_count copies of a scenario at once, each in its own tab of a single browser
+        scenario = next(scenario for scenario in self.scenarios if scenario["name"] == scenario_name)
+
+        results = []
+
+        with FixtureServer(os.path.join(self.benchmark_dir, "forms")) as server:
+
+            for tab_count in tab_counts:
+
+                browser = BrowserTabs(self.driver_factory())
+
+                try:
+
+                    tabs = [browser.open_tab() for _ in range(tab_count)]
+
+                    start_time = time.perf_counter()
+
+                    with ThreadPoolExecutor(max_workers=tab_count) as executor:
+
+                        runs = list(executor.map(lambda tab: self.run_scenario(scenario, server.base_url, driver=tab), tabs))
+
+                    seconds = time.perf_counter() - start_time
+
+                    #measured with every tab still open on its last page
+                    rss = browser.get_rss()
+
+                finally:
+
+                    browser.quit()
+
+                results.append({
+                    "tabs": tab_count,
+                    "seconds": seconds,
+                    "seconds_per_application": statistics.median(run["seconds"] for run in runs),
+                    "applications_per_minute": 60 * tab_count / seconds,
+                    "rss_mb_per_application": rss / tab_count / 2**20 if rss is not None else None,
+                    "tab_switches": browser.switches
+                })
+
+        return results
+
+    def get_commit(self) -> str:
+
+        try:
+
+            commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+            dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True).stdout.strip()
+
+        except (OSError, subprocess.CalledProcessError):
+
+            return "unknown"
+
+        return commit + ("-dirty" if dirty else "")
+
+    def get_configuration(self, result: dict) -> tuple:
+
+        #results are only compared within a configuration: a replayed run is no baseline for a chrome run, nor a median of 3 for a single run;
+        #results recorded before the backend was stored all ran in chrome
+        return (result["scenario"], result.get("driver_backend", "chrome"), result.get("repeat", 1))
+
+    def load_previous_results(self, commit: str) -> dict:
+
+        previous = {}
+
+        if not os.path.exists(self.results_path):
+
+            return previous
+
+        with open(self.results_path, "r") as f:
+
+            for line in f:
+
+                result = json.loads(line)
+
+                #the latest result of each scenario and configuration from another commit is the baseline
+                if result["commit"] != commit:
+
+                    previous[self.get_configuration(result)] = result
+
+        return previous
+
+    def record(self, results: list) -> list:
+
+        commit = self.get_commit()
+
+        previous = self.load_previous_results(commit)
+
+        regressions = []
+
+        for result in results:
+
+            baseline = previous.get(self.get_configuration(result))
+
+            if baseline is not None:
+
+                for metric in COMPARED_METRICS:
+
+                    if baseline.get(metric) and result[metric] > baseline[metric] * (1 + self.tolerance):
+
+                        regressions.append(f"{result['scenario']}: {metric} {baseline[metric]:.2f} -> {result[metric]:.2f} (baseline {baseline['commit']})")
+
+        with open(self.results_path, "a") as f:
+
+            for result in results:
+
+                f.write(json.dumps(dict(result, commit=commit, timestamp=time.time())) + "\n")
+
+        return regressions
+
+def format_results(results: list) -> str:
+
+    header = f"{'scenario':<12} {'s/app':>8} {'update s':>9} {'updates':>8} {'trips':>7} {'iters':>6} {'prompt tok':>11}"
+
+    lines = [header, "-" * len(header)]
+
+    for result in results:
+
+        lines.append(
+            f"{result['scenario']:<12} {result['seconds']:>8.2f} {result['update_elements_seconds']:>9.2f} {result['update_elements_calls']:>8} "
+            f"{result['round_trips']:>7} {result['iterations']:>6} {result['prompt_tokens']:>11}"
+        )
+
+    return "\n".join(lines)
+
+def format_tab_scaling(results: list) -> str:
+
+    header = f"{'tabs':>5} {'wall s':>8} {'s/app':>8} {'apps/min':>9} {'MB/app':>8} {'switches':>9}"
+
+    lines = [header, "-" * len(header)]
+
+    for result in results:
+
+        rss = f"{result['rss_mb_per_application']:.0f}" if result["rss_mb_per_application"] is not None else "n/a"
+
+        lines.append(
+            f"{result['tabs']:>5} {result['seconds']:>8.2f} {result['seconds_per_application']:>8.2f} {result['applications_per_minute']:>9.2f} "
+            f"{rss:>8} {result['tab_switches']:>9}"
+        )
+
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-s", "--scenarios", nargs="*", help="Scenario names to run (default: all)")
+    parser.add_argument("-r", "--repeat", type=int, default=1, help="Runs per scenario; the median is reported")
+    parser.add_argument("--no-record", action="store_true", help="Do not append results to benchmarks/results.jsonl")
+    parser.add_argument("--driver-backend", choices=["chrome", "record", "replay"], default="chrome", help="Run in chrome, record WebDriver calls to benchmarks/recordings, or replay them without a browser")
+    parser.add_argument("--tab-scaling", type=int, nargs="*", help="Instead of the benchmark, run the first scenario in this many tabs of one browser at once, for each given count")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    benchmark_runner = BenchmarkRunner(verbose=args.verbose, driver_backend=args.driver_backend)
+
+    if args.tab_scaling:
+
+        scenario_name = args.scenarios[0] if args.scenarios else benchmark_runner.scenarios[0]["name"]
+
+        print(format_tab_scaling(benchmark_runner.run_tab_scaling(scenario_name, args.tab_scaling)))
+
+    else:
+
+        results = benchmark_runner.run(scenario_names=args.scenarios, repeat=args.repeat)
+
+        print(format_results(results))
+
+        if not args.no_record:
+
+            regressions = benchmark_runner.record(results)
+
+            for regression in regressions:
+
+                print("REGRESSION", regression)
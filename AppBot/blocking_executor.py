@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import functools
+
+class BlockingCallExecutor:
+
+    def __init__(self, max_workers: int = 16) -> None:
+
+        self.max_workers = max_workers
+
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="appbot-blocking")
+
+    async def run(self, func, *args, **kwargs):
+
+        loop = asyncio.get_running_loop()
+
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    def shutdown(self) -> None:
+
+        self.executor.shutdown(wait=True)
+
+#shared by every engine and profile that is not given its own executor
+default_executor = BlockingCallExecutor()
@@ -0,0 +1,98 @@
+import glob
+import os
+
+#requests blocked in the lightweight profile: images, fonts and media are never needed to fill out a form,
+#and third-party trackers only add requests the readiness check would wait for
+BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.svg", "*.ico", "*.bmp", "*.avif",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.mp3", "*.ogg", "*.wav", "*.m4a",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*facebook.net*", "*connect.facebook.com*",
+    "*hotjar.com*", "*segment.io*", "*cdn.segment.com*", "*mixpanel.com*", "*fullstory.com*", "*nr-data.net*",
+    "*newrelic.com*", "*optimizely.com*", "*clarity.ms*", "*linkedin.com/px*", "*snap.licdn.com*"
+]
+
+LIGHTWEIGHT_ARGUMENTS = [
+    "--headless=new",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-dev-shm-usage",
+    "--no-first-run",
+    "--mute-audio",
+    "--blink-settings=imagesEnabled=false"
+]
+
+LIGHTWEIGHT_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.default_content_setting_values.notifications": 2,
+    "profile.default_content_setting_values.geolocation": 2
+}
+
+def configure_lightweight(chrome_options) -> None:
+
+    for argument in LIGHTWEIGHT_ARGUMENTS:
+
+        chrome_options.add_argument(argument)
+
+    chrome_options.add_experimental_option("prefs", LIGHTWEIGHT_PREFS)
+
+def block_resources(driver) -> None:
+
+    #the prefs only stop images; the rest is blocked at the network layer
+    driver.execute_cdp_cmd("Network.enable", {})
+    driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+
+    #the block list only applies to the window it was sent to; tabs opened later in the browser need their own
+    driver.resources_blocked = True
+
+def get_process_rss(pid: int) -> int:
+
+    #resident memory of a process and all of its descendants in bytes, read from /proc; None where /proc is unavailable
+    if not os.path.isdir("/proc"):
+
+        return None
+
+    total = 0
+    pids = [pid]
+
+    while pids:
+
+        current = pids.pop()
+
+        try:
+
+            with open(f"/proc/{current}/status", "r") as f:
+
+                for line in f:
+
+                    if line.startswith("VmRSS:"):
+
+                        total += int(line.split()[1]) * 1024
+
+            for children_path in glob.glob(f"/proc/{current}/task/*/children"):
+
+                with open(children_path, "r") as f:
+
+                    pids.extend(int(child) for child in f.read().split())
+
+        except (OSError, ValueError):
+
+            #processes can exit while the tree is walked
+            continue
+
+    return total
+
+def get_browser_rss(driver) -> int:
+
+    #chromedriver's process tree includes the browser and its renderers
+    try:
+
+        pid = driver.service.process.pid
+
+    except AttributeError:
+
+        return None
+
+    return get_process_rss(pid)
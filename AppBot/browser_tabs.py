@@ -0,0 +1,447 @@
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.switch_to import SwitchTo
+from selenium.common.exceptions import WebDriverException
+from concurrent.futures import ThreadPoolExecutor
+from selenium_engine import SeleniumEngine
+from browser_profile import block_resources, get_browser_rss
+import copy
+import threading
+import time
+
+#starts a navigation without waiting for it; a marker on the old document tells it apart from the new one.
+#A change of the fragment alone keeps the document, so it is not marked.
+NAVIGATE_SCRIPT = """
+var target = new URL(arguments[0], window.location.href);
+if (!(target.hash && target.href.split('#')[0] === window.location.href.split('#')[0])) {
+    window.__appbotTabNavigation = true;
+}
+window.location.href = target.href;
+"""
+
+LOADED_SCRIPT = "return !window.__appbotTabNavigation && document.readyState === 'complete';"
+
+class BrowserTabs:
+
+    def __init__(self, driver, isolated: bool = True, page_load_timeout: float = 60.0, poll_interval: float = 0.05) -> None:
+
+        #one browser session hosting many applications, each in its own tab
+        self.driver = driver
+
+        #each tab gets its own browser context, so applications never share cookies or storage
+        self.isolated = isolated
+
+        #WebDriver commands always target the session's current window, so tabs take turns on the session
+        self.lock = threading.RLock()
+        self.current_handle = driver.current_window_handle
+
+        #window handle -> browser context id (None for plain tabs)
+        self.tabs = {}
+
+        #tabs handed out by a TabPool, including ones still being opened
+        self.assigned = 0
+
+        #a tab loads its pages in short commands, so other tabs keep the session while it waits
+        self.page_load_timeout = page_load_timeout
+        self.poll_interval = poll_interval
+
+        self.commands = 0
+        self.switches = 0
+
+    def open_tab(self):
+
+        with self.lock:
+
+            context_id = None
+            handles = set(self.driver.window_handles)
+
+            try:
+
+                if not self.isolated:
+
+                    raise RuntimeError("isolated contexts are disabled")
+
+                context_id = self.driver.execute_cdp_cmd("Target.createBrowserContext", {})["browserContextId"]
+
+                self.driver.execute_cdp_cmd("Target.createTarget", {"url": "about:blank", "browserContextId": context_id})
+
+                #chromedriver only reports the new target as a window handle once it exists
+                new_handles = set(self.driver.window_handles) - handles
+
+                handle = new_handles.pop()
+
+            except Exception:
+
+                if context_id is not None:
+
+                    self.dispose_context(context_id)
+
+                context_id = None
+
+                handle = self.driver.execute(Command.NEW_WINDOW, {"type": "tab"})["value"]["handle"]
+
+            self.tabs[handle] = context_id
+
+        tab = self.create_tab_driver(handle)
+
+        #a lightweight browser blocks fonts, media and trackers in every application tab, not just its first window
+        if getattr(self.driver, "resources_blocked", False):
+
+            try:
+
+                block_resources(tab)
+
+            except Exception:
+
+                tab.quit()
+
+                raise
+
+        return tab
+
+    def create_tab_driver(self, handle: str):
+
+        #a shallow copy shares the session with the browser's driver; only execute, switch_to and quit are its own
+        tab = copy.copy(self.driver)
+
+        for name in ["execute", "uncounted_execute", "readiness_installed"]:
+
+            tab.__dict__.pop(name, None)
+
+        tab.tab_handle = handle
+        tab._switch_to = SwitchTo(tab)
+
+        def execute(driver_command: str, params: dict = None):
+
+            if driver_command == Command.GET:
+
+                return navigate(params["url"])
+
+            with self.lock:
+
+                if self.current_handle != tab.tab_handle:
+
+                    self.driver.execute(Command.SWITCH_TO_WINDOW, {"handle": tab.tab_handle})
+
+                    self.current_handle = tab.tab_handle
+                    self.switches += 1
+
+                self.commands += 1
+
+                response = self.driver.execute(driver_command, params)
+
+                #a tab that switches windows itself keeps the window it switched to
+                if driver_command == Command.SWITCH_TO_WINDOW:
+
+                    tab.tab_handle = self.current_handle = params["handle"]
+
+                return response
+
+        def navigate(url: str) -> dict:
+
+            #a blocking get would hold the lock for the whole page load, stalling every other tab of the browser
+            execute(Command.W3C_EXECUTE_SCRIPT, {"script": NAVIGATE_SCRIPT, "args": [url]})
+
+            deadline = time.perf_counter() + self.page_load_timeout
+
+            while time.perf_counter() < deadline:
+
+                time.sleep(self.poll_interval)
+
+                try:
+
+                    if execute(Command.W3C_EXECUTE_SCRIPT, {"script": LOADED_SCRIPT, "args": []})["value"]:
+
+                        break
+
+                except WebDriverException:
+
+                    #scripts fail while the browser swaps documents
+                    pass
+
+            return {"value": None}
+
+        tab.execute = execute
+        tab.quit = lambda: self.close_tab(tab.tab_handle)
+
+        return tab
+
+    def close_tab(self, handle: str) -> None:
+
+        with self.lock:
+
+            context_id = self.tabs.pop(handle, None)
+
+            try:
+
+                if self.current_handle != handle:
+
+                    self.driver.execute(Command.SWITCH_TO_WINDOW, {"handle": handle})
+
+                self.driver.execute(Command.CLOSE)
+
+            finally:
+
+                #the session has no current window until the next tab command switches to one
+                self.current_handle = None
+
+                if context_id is not None:
+
+                    self.dispose_context(context_id)
+
+    def dispose_context(self, context_id: str) -> None:
+
+        try:
+
+            self.driver.execute_cdp_cmd("Target.disposeBrowserContext", {"browserContextId": context_id})
+
+        except Exception:
+
+            pass
+
+    def open_tab_count(self) -> int:
+
+        #read without the lock, which a tab holds while its commands run
+        return len(self.tabs)
+
+    def get_rss(self) -> int:
+
+        return get_browser_rss(self.driver)
+
+    def quit(self) -> None:
+
+        with self.lock:
+
+            self.tabs = {}
+
+            self.driver.quit()
+
+class TabPool:
+
+    def __init__(self, size: int, tabs_per_browser: int = 4, driver_factory = None, isolated: bool = True) -> None:
+
+        #drop-in replacement for WebDriverPool that hands out tabs, packing up to tabs_per_browser of them into each browser
+        self.size = size
+        self.tabs_per_browser = max(tabs_per_browser, 1)
+        self.driver_factory = driver_factory if driver_factory is not None else SeleniumEngine.create_driver
+        self.isolated = isolated
+
+        self.browsers = []
+        self.lock = threading.Lock()
+        self.available = threading.Condition(self.lock)
+
+        #id of a handed out tab driver -> the browser hosting it
+        self.tab_browsers = {}
+
+        #browsers being started, counted against the limit before they exist
+        self.starting = 0
+
+        self.in_use = 0
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquisitions = 0
+        self.total_wait_seconds = 0.0
+        self.startup_seconds = []
+
+    def get_browser_count(self) -> int:
+
+        return -(-self.size // self.tabs_per_browser)
+
+    def start_browser(self, assign: bool = False) -> BrowserTabs:
+
+        start_time = time.perf_counter()
+
+        try:
+
+            browser = BrowserTabs(self.driver_factory(), isolated=self.isolated)
+
+        except Exception:
+
+            with self.available:
+
+                self.starting -= 1
+                self.available.notify_all()
+
+            raise
+
+        with self.available:
+
+            self.starting -= 1
+            self.startup_seconds.append(time.perf_counter() - start_time)
+            self.browsers.append(browser)
+
+            if assign:
+
+                browser.assigned += 1
+
+            self.available.notify_all()
+
+        return browser
+
+    def prestart(self, count: int) -> int:
+
+        #only the browsers needed for count tabs are started; tabs open in milliseconds
+        count = -(-max(count, 0) // self.tabs_per_browser)
+
+        with self.lock:
+
+            count = max(min(count, self.get_browser_count() - len(self.browsers) - self.starting), 0)
+
+            self.starting += count
+
+        with ThreadPoolExecutor(max_workers=max(count, 1)) as executor:
+
+            futures = [executor.submit(self.start_browser) for _ in range(count)]
+
+        return sum(1 for future in futures if future.exception() is None)
+
+    def find_browser(self) -> BrowserTabs:
+
+        browsers = [browser for browser in self.browsers if browser.assigned < self.tabs_per_browser]
+
+        return min(browsers, key=lambda browser: browser.assigned) if browsers else None
+
+    def acquire(self):
+
+        start_time = time.perf_counter()
+
+        with self.available:
+
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+            #wait for a free slot, in a running browser or in one this caller may start
+            while True:
+
+                browser = self.find_browser() if self.in_use < self.size else None
+
+                if browser is not None or (self.in_use < self.size and len(self.browsers) + self.starting < self.get_browser_count()):
+
+                    break
+
+                self.available.wait()
+
+            self.waiting -= 1
+            self.in_use += 1
+
+            if browser is None:
+
+                self.starting += 1
+
+            else:
+
+                browser.assigned += 1
+
+        try:
+
+            if browser is None:
+
+                browser = self.start_browser(assign=True)
+
+            tab = browser.open_tab()
+
+        except Exception:
+
+            with self.available:
+
+                self.in_use -= 1
+
+                if browser is not None:
+
+                    browser.assigned -= 1
+
+                self.available.notify_all()
+
+            raise
+
+        with self.lock:
+
+            self.tab_browsers[id(tab)] = browser
+            self.acquisitions += 1
+            self.total_wait_seconds += time.perf_counter() - start_time
+
+        return tab
+
+    def release(self, tab) -> None:
+
+        with self.lock:
+
+            browser = self.tab_browsers.pop(id(tab), None)
+
+        try:
+
+            #a fresh tab per application replaces cleaning: closing the tab discards its context's cookies and storage
+            tab.quit()
+
+        except Exception:
+
+            #a browser that can no longer close its tabs is discarded; its other applications fail on their next command
+            if browser is not None:
+
+                with self.lock:
+
+                    if browser in self.browsers:
+
+                        self.browsers.remove(browser)
+
+                self.quit_browser(browser)
+
+        with self.available:
+
+            self.in_use -= 1
+
+            if browser is not None:
+
+                browser.assigned -= 1
+
+            self.available.notify_all()
+
+    def get_rss(self, tab) -> int:
+
+        #the browser's memory is shared by its tabs, so each application is charged an equal share
+        with self.lock:
+
+            browser = self.tab_browsers.get(id(tab))
+
+        if browser is None:
+
+            return None
+
+        rss = browser.get_rss()
+
+        return rss // max(browser.open_tab_count(), 1) if rss is not None else None
+
+    def quit_browser(self, browser: BrowserTabs) -> None:
+
+        try:
+
+            browser.quit()
+
+        except Exception:
+
+            pass
+
+    def close(self) -> None:
+
+        with self.lock:
+
+            browsers, self.browsers = self.browsers, []
+
+        for browser in browsers:
+
+            self.quit_browser(browser)
+
+    def get_stats(self) -> dict:
+
+        with self.lock:
+
+            return {
+                "sessions": len(self.browsers),
+                "tabs": sum(browser.open_tab_count() for browser in self.browsers),
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "average_wait_seconds": self.total_wait_seconds / self.acquisitions if self.acquisitions else 0.0,
+                "average_startup_seconds": sum(self.startup_seconds) / len(self.startup_seconds) if self.startup_seconds else 0.0,
+                "tab_switches": sum(browser.switches for browser in self.browsers),
+                "tab_commands": sum(browser.commands for browser in self.browsers)
+            }
@@ -0,0 +1,346 @@
+#Element categories extracted from the page, keyed by registry name. The label prefixes the keys of elements without a name.
+ELEMENT_CATEGORIES = {
+    "text_input_elements": {"selector": "input[type='text']", "attributes": ["placeholder", "name", "value", "id"], "label": "text-input"},
+    "buttons": {"selector": "button", "attributes": ["text", "id"], "label": "button"},
+    "href_links": {"selector": "a", "attributes": ["text", "name", "href", "id"], "label": "link"},
+    "select_elements": {"selector": "select", "attributes": ["name", "id"], "label": "select"},
+    "file_upload_elements": {"selector": "input[type='file']", "attributes": ["name", "id"], "label": "file-upload"},
+    "headings": {"selector": "h1, h2, h3, legend, [role='heading']", "attributes": ["innerText"], "label": "heading"},
+    "messages": {
+        "selector": "[role='alert'], [aria-live='assertive'], .error, .error-message, .field-error, .invalid-feedback, .validation-message",
+        "attributes": ["innerText"],
+        "label": "message"
+    }
+}
+
+#categories keyed by their visible text, used to describe how the page changed rather than to act on elements
+TEXT_CATEGORIES = ["headings", "messages"]
+
+#DOM attribute holding the engine's id of an element, stable for the lifetime of the element
+ELEMENT_ID_ATTRIBUTE = "data-appbot-id"
+
+#Collects displayed elements in a single execute_script call. On first use in a document a MutationObserver
+#is installed that marks categories dirty when a mutation touches one of their elements; later calls only
+#re-extract dirty categories. A new document has no observer, so navigation always yields a full rebuild.
+#Every extracted element is stamped with a per-document id, which later locates it again without a rebuild.
+#The section of an element is the legend of its fieldset, or else the closest heading before it.
+#Returns {"full": bool, "url": str, "categories": {category: [{"element": WebElement, "id": str, "section": str, "attrs": {...}, "options": [...]}, ...]}}
+SNAPSHOT_SCRIPT = """
+var categories = arguments[0];
+var requested = arguments[1] || Object.keys(categories);
+var force = arguments[2];
+var idAttribute = arguments[3];
+
+function touches(node, selector) {
+    var element = node.nodeType === 1 ? node : node.parentElement;
+    if (!element) {
+        return false;
+    }
+    return element.matches(selector) || element.closest(selector) !== null || element.querySelector(selector) !== null;
+}
+
+var registry = window.__appbotRegistry;
+var full = force || !registry;
+
+if (!registry) {
+    registry = window.__appbotRegistry = {dirty: {}, nextId: 0};
+    registry.markDirty = function (mutations) {
+        Object.keys(categories).forEach(function (category) {
+            if (registry.dirty[category]) {
+                return;
+            }
+            var selector = categories[category].selector;
+            registry.dirty[category] = mutations.some(function (mutation) {
+                if (touches(mutation.target, selector)) {
+                    return true;
+                }
+                var changed = Array.prototype.slice.call(mutation.addedNodes).concat(Array.prototype.slice.call(mutation.removedNodes));
+                return changed.some(function (node) {
+                    return touches(node, selector);
+                });
+            });
+        });
+    };
+    registry.observer = new MutationObserver(registry.markDirty);
+    registry.observer.observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+}
+
+//process records the observer has not delivered yet
+registry.markDirty(registry.observer.takeRecords());
+
+function readAttribute(element, name) {
+    var value = element[name];
+    if (value === undefined || value === null || typeof value === 'object' || typeof value === 'function') {
+        value = element.getAttribute(name);
+    }
+    return (value === undefined || value === null) ? null : String(value);
+}
+
+function isDisplayed(element) {
+    if (!element.getClientRects().length) {
+        return false;
+    }
+    var style = window.getComputedStyle(element);
+    if (style.visibility === 'hidden' || style.visibility === 'collapse') {
+        return false;
+    }
+    for (var node = element; node && node.nodeType === 1; node = node.parentElement) {
+        if (window.getComputedStyle(node).opacity === '0') {
+            return false;
+        }
+    }
+    return true;
+}
+
+var headingSelector = 'h1, h2, h3, h4, h5, h6, [role="heading"]';
+
+function cleanText(text) {
+    text = text.replace(/\\s+/g, ' ').trim();
+    return text.length > 80 ? text.slice(0, 80) + '...' : text;
+}
+
+function sectionOf(element) {
+    var fieldset = element.closest('fieldset');
+    var legend = fieldset ? fieldset.querySelector('legend') : null;
+    if (legend && legend.textContent.trim()) {
+        return cleanText(legend.textContent);
+    }
+    for (var node = element; node && node.nodeType === 1; node = node.parentElement) {
+        for (var sibling = node.previousElementSibling; sibling; sibling = sibling.previousElementSibling) {
+            if (sibling.matches(headingSelector) && sibling.textContent.trim()) {
+                return cleanText(sibling.textContent);
+            }
+            var headings = sibling.querySelectorAll(headingSelector);
+            for (var i = headings.length - 1; i >= 0; i--) {
+                if (headings[i].textContent.trim()) {
+                    return cleanText(headings[i].textContent);
+                }
+            }
+        }
+    }
+    return null;
+}
+
+var snapshot = {};
+var stamped = {};
+requested.forEach(function (category) {
+    if (!full && !registry.dirty[category]) {
+        return;
+    }
+    registry.dirty[category] = false;
+    var spec = categories[category];
+    var entries = [];
+    document.querySelectorAll(spec.selector).forEach(function (element) {
+        if (!isDisplayed(element)) {
+            return;
+        }
+        //cloned elements carry the id of their original, so ids already seen in this pass are replaced
+        var id = element.getAttribute(idAttribute);
+        if (!id || stamped[id]) {
+            id = String(++registry.nextId);
+            element.setAttribute(idAttribute, id);
+        }
+        stamped[id] = true;
+        var attrs = {};
+        spec.attributes.forEach(function (name) {
+            attrs[name] = readAttribute(element, name);
+        });
+        var entry = {element: element, id: id, section: sectionOf(element), attrs: attrs};
+        if (element.tagName === 'SELECT') {
+            entry.options = Array.prototype.map.call(element.options, function (option) {
+                return option.value;
+            });
+        }
+        entries.push(entry);
+    });
+    snapshot[category] = entries;
+});
+
+//stamping ids is not a change of the page
+registry.observer.takeRecords();
+
+return {full: full, url: location.href, categories: snapshot};
+"""
+
+#Re-finds an element whose WebElement handle went stale, trying each CSS selector in turn and accepting only
+#a unique match, which is stamped with the element's previous id. arguments are [selectors, id, id attribute];
+#returns the element, or null if none of the selectors matches exactly one element.
+RESOLVE_SCRIPT = """
+var selectors = arguments[0];
+var id = arguments[1];
+var idAttribute = arguments[2];
+
+for (var i = 0; i < selectors.length; i++) {
+    var matches = document.querySelectorAll(selectors[i]);
+    if (matches.length === 1) {
+        matches[0].setAttribute(idAttribute, id);
+        if (window.__appbotRegistry) {
+            window.__appbotRegistry.observer.takeRecords();
+        }
+        return matches[0];
+    }
+}
+return null;
+"""
+
+#Tracks page activity for the readiness check: pending fetch/XHR requests, the time and count of requests and
+#DOM mutations, and when the document started unloading. The element ids set by the snapshot are not activity.
+#Safe to run more than once per document.
+READINESS_INSTRUMENT_SCRIPT = """
+(function () {
+    if (window.__appbotReadiness) {
+        return;
+    }
+    var state = window.__appbotReadiness = {pending: 0, activity: 0, lastActivity: performance.now(), waitStart: 0, lastPoll: 0, navigating: 0};
+    function touch() {
+        state.activity++;
+        state.lastActivity = performance.now();
+    }
+    function finish() {
+        state.pending = Math.max(state.pending - 1, 0);
+        touch();
+    }
+    if (window.fetch) {
+        var originalFetch = window.fetch;
+        window.fetch = function () {
+            state.pending++;
+            touch();
+            return originalFetch.apply(this, arguments).then(function (response) {
+                finish();
+                return response;
+            }, function (error) {
+                finish();
+                throw error;
+            });
+        };
+    }
+    var originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        state.pending++;
+        touch();
+        this.addEventListener('loadend', finish);
+        return originalSend.apply(this, arguments);
+    };
+    new MutationObserver(function (records) {
+        for (var i = 0; i < records.length; i++) {
+            if (records[i].type !== 'attributes' || records[i].attributeName !== '""" + ELEMENT_ID_ATTRIBUTE + """') {
+                touch();
+                return;
+            }
+        }
+    }).observe(document, {childList: true, subtree: true, attributes: true, characterData: true});
+    window.addEventListener('beforeunload', function () {
+        state.navigating = performance.now();
+    });
+    window.addEventListener('pagehide', function () {
+        state.navigating = performance.now();
+    });
+})();
+"""
+
+#Reports the readiness of the current document, instrumenting it first if needed. arguments[0] is true on the first
+#poll after an action, which starts the quiet period: activity before the action does not count as quiet time.
+#An unload that an earlier poll already saw did not replace the document (it was cancelled, or started a download),
+#so the first poll clears it.
+#Returns {"ready_state": str, "navigating": bool, "pending_requests": int, "quiet_ms": float, "document_id": float, "activity": int}
+READINESS_POLL_SCRIPT = READINESS_INSTRUMENT_SCRIPT + """
+var state = window.__appbotReadiness;
+var now = performance.now();
+if (arguments[0]) {
+    state.waitStart = now;
+    if (state.navigating && state.navigating <= state.lastPoll) {
+        state.navigating = 0;
+    }
+}
+state.lastPoll = now;
+return {
+    ready_state: document.readyState,
+    navigating: state.navigating > 0,
+    pending_requests: state.pending,
+    quiet_ms: now - Math.max(state.lastActivity, state.waitStart),
+    document_id: performance.timeOrigin,
+    activity: state.activity
+};
+"""
+
+#Sets the value of several inputs in one execute_script call. The native value setter is used so that
+#framework-managed inputs (React, Angular) see the change, followed by the events they listen for. Unlike send_keys,
+#the text replaces the field's current value instead of being appended to it.
+#arguments[0] is a list of [element, text] pairs; returns a list of {"ok": bool, "error": str} in the same order.
+FILL_SCRIPT = """
+return arguments[0].map(function (pair) {
+    var element = pair[0];
+    var text = pair[1];
+    try {
+        if (element.disabled || element.readOnly) {
+            return {ok: false, error: 'field is disabled or read-only'};
+        }
+        var prototype = element instanceof HTMLTextAreaElement ? HTMLTextAreaElement.prototype : HTMLInputElement.prototype;
+        var setter = Object.getOwnPropertyDescriptor(prototype, 'value').set;
+        element.focus();
+        setter.call(element, text);
+        element.dispatchEvent(new Event('input', {bubbles: true}));
+        element.dispatchEvent(new Event('change', {bubbles: true}));
+        element.blur();
+        return {ok: true, error: null};
+    } catch (error) {
+        return {ok: false, error: String(error)};
+    }
+});
+"""
+
+#Reads the current values of form elements, for checkpoints of a partly filled form. arguments[0] is a list of
+#[category, key, element]; returns {category: {key: value}}, skipping empty values and elements that are gone.
+FORM_VALUES_SCRIPT = """
+var values = {};
+arguments[0].forEach(function (entry) {
+    try {
+        if (entry[2].value) {
+            values[entry[0]] = values[entry[0]] || {};
+            values[entry[0]][entry[1]] = entry[2].value;
+        }
+    } catch (error) {}
+});
+return values;
+"""
+
+#Extracts the rendered, visible text of the page as one entry per block element, skipping scripts, styles,
+#SVG and other non-content nodes. Also returns the size of the raw page source for comparison.
+VISIBLE_TEXT_SCRIPT = """
+var skipped = 'script, style, noscript, template, svg, canvas, iframe, object, head';
+var visibility = new Map();
+
+function isVisible(element) {
+    if (!visibility.has(element)) {
+        var style = window.getComputedStyle(element);
+        visibility.set(element, element.getClientRects().length > 0 && style.visibility !== 'hidden' && style.visibility !== 'collapse');
+    }
+    return visibility.get(element);
+}
+
+function blockOf(element) {
+    while (element.parentElement && window.getComputedStyle(element).display.indexOf('inline') === 0) {
+        element = element.parentElement;
+    }
+    return element;
+}
+
+var lines = [];
+var currentBlock = null;
+var walker = document.createTreeWalker(document.body || document.documentElement, NodeFilter.SHOW_TEXT);
+
+for (var node = walker.nextNode(); node; node = walker.nextNode()) {
+    var parent = node.parentElement;
+    if (!parent || !node.nodeValue.trim() || parent.closest(skipped) || !isVisible(parent)) {
+        continue;
+    }
+    var block = blockOf(parent);
+    if (block !== currentBlock || !lines.length) {
+        lines.push('');
+        currentBlock = block;
+    }
+    lines[lines.length - 1] += ' ' + node.nodeValue;
+}
+
+return {lines: lines, raw_length: document.documentElement.outerHTML.length};
+"""
@@ -0,0 +1,315 @@
+from selenium.webdriver.remote.webelement import WebElement
+import selenium.common.exceptions as selenium_exceptions
+import json
+import threading
+
+#methods whose first argument is a script; a script's calls are only ever answered with results of the same script
+SCRIPT_METHODS = ["execute_script", "execute_async_script"]
+
+#attributes that are never recorded: the engine's round-trip counter wraps execute on whatever driver it gets
+PASSTHROUGH_ATTRIBUTES = ["execute", "uncounted_execute"]
+
+class ReplayMismatchError(Exception):
+
+    pass
+
+class RecordingElement:
+
+    def __init__(self, element: WebElement, recorder) -> None:
+
+        object.__setattr__(self, "element", element)
+        object.__setattr__(self, "recorder", recorder)
+
+    @property
+    def id(self) -> str:
+
+        return self.element.id
+
+    def __getattr__(self, name: str):
+
+        return self.recorder.record_attribute(self.element, self.element.id, name)
+
+class RecordingDriver:
+
+    def __init__(self, driver, recording_path: str) -> None:
+
+        object.__setattr__(self, "driver", driver)
+        object.__setattr__(self, "recording_file", open(recording_path, "w"))
+        object.__setattr__(self, "lock", threading.Lock())
+
+    def __getattr__(self, name: str):
+
+        if name in PASSTHROUGH_ATTRIBUTES:
+
+            return getattr(self.driver, name)
+
+        return self.record_attribute(self.driver, "driver", name)
+
+    def __setattr__(self, name: str, value) -> None:
+
+        setattr(self.driver, name, value)
+
+    def record_attribute(self, target, target_id: str, name: str):
+
+        value = getattr(target, name)
+
+        if not callable(value):
+
+            return self.record(target_id, name, "property", None, lambda: value)
+
+        def recorded_call(*args):
+
+            return self.record(target_id, name, "call", list(args), lambda: value(*self.unwrap(list(args))))
+
+        return recorded_call
+
+    def record(self, target_id: str, name: str, kind: str, args, call):
+
+        try:
+
+            result = call()
+
+        except selenium_exceptions.WebDriverException as e:
+
+            self.write_entry({"target": target_id, "method": name, "kind": kind, "args": self.serialize(args), "error": type(e).__name__, "message": e.msg})
+
+            raise
+
+        try:
+
+            serialized_result = self.serialize(result)
+
+        except TypeError:
+
+            #results that cannot be stored (e.g. switch_to) are passed through unrecorded
+            return result
+
+        self.write_entry({"target": target_id, "method": name, "kind": kind, "args": self.serialize(args), "result": serialized_result})
+
+        return self.wrap(result)
+
+    def write_entry(self, entry: dict) -> None:
+
+        with self.lock:
+
+            self.recording_file.write(json.dumps(entry) + "\n")
+            self.recording_file.flush()
+
+    def serialize(self, value):
+
+        if isinstance(value, (RecordingElement, WebElement)):
+
+            return {"__element__": value.id}
+
+        if isinstance(value, (list, tuple)):
+
+            return [self.serialize(item) for item in value]
+
+        if isinstance(value, dict):
+
+            return {key: self.serialize(item) for key, item in value.items()}
+
+        if value is None or isinstance(value, (str, int, float, bool)):
+
+            return value
+
+        raise TypeError(f"Cannot record value of type {type(value).__name__}")
+
+    def unwrap(self, value):
+
+        if isinstance(value, RecordingElement):
+
+            return value.element
+
+        if isinstance(value, list):
+
+            return [self.unwrap(item) for item in value]
+
+        if isinstance(value, dict):
+
+            return {key: self.unwrap(item) for key, item in value.items()}
+
+        return value
+
+    def wrap(self, value):
+
+        if isinstance(value, WebElement):
+
+            return RecordingElement(value, self)
+
+        if isinstance(value, list):
+
+            return [self.wrap(item) for item in value]
+
+        if isinstance(value, dict):
+
+            return {key: self.wrap(item) for key, item in value.items()}
+
+        return value
+
+    def quit(self) -> None:
+
+        self.recording_file.close()
+
+        self.driver.quit()
+
+class ReplayElement:
+
+    def __init__(self, replay_driver, element_id: str) -> None:
+
+        self.replay_driver = replay_driver
+        self.id = element_id
+
+    def __getattr__(self, name: str):
+
+        return self.replay_driver.replay_attribute(self.id, name)
+
+class ReplayDriver:
+
+    def __init__(self, recording_path: str) -> None:
+
+        #recorded entries in order, each served once; indexed by exact call, with a looser (target, method, script) fallback
+        #for arguments that differ between runs, such as the port of a local server or an absolute file path
+        self.entries = []
+        self.consumed = []
+        self.exact_results = {}
+        self.loose_results = {}
+
+        #index key -> position of its first entry that may not have been served yet, per index
+        self.exact_cursors = {}
+        self.loose_cursors = {}
+
+        self.properties = set()
+        self.lock = threading.Lock()
+
+        with open(recording_path, "r") as f:
+
+            for line in f:
+
+                entry = json.loads(line)
+
+                if entry["kind"] == "property":
+
+                    self.properties.add(entry["method"])
+
+                self.exact_results.setdefault(self.make_key(entry["target"], entry["method"], entry["args"]), []).append(len(self.entries))
+                self.loose_results.setdefault(self.make_loose_key(entry["target"], entry["method"], entry["args"]), []).append(len(self.entries))
+
+                self.entries.append(entry)
+                self.consumed.append(False)
+
+    def make_key(self, target_id: str, name: str, args) -> tuple:
+
+        return (target_id, name, json.dumps(args, sort_keys=True))
+
+    def make_loose_key(self, target_id: str, name: str, args) -> tuple:
+
+        script = args[0] if name in SCRIPT_METHODS and args else None
+
+        return (target_id, name, script)
+
+    def __getattr__(self, name: str):
+
+        if name in PASSTHROUGH_ATTRIBUTES or name.startswith("__"):
+
+            raise AttributeError(name)
+
+        return self.replay_attribute("driver", name)
+
+    def replay_attribute(self, target_id: str, name: str):
+
+        if name in self.properties:
+
+            return self.execute("replay", {"target": target_id, "method": name, "args": None})
+
+        def replayed_call(*args):
+
+            return self.execute("replay", {"target": target_id, "method": name, "args": self.serialize(list(args))})
+
+        return replayed_call
+
+    def execute(self, command: str, params: dict = None):
+
+        entry = self.next_entry(params["target"], params["method"], params["args"])
+
+        if "error" in entry:
+
+            exception_class = getattr(selenium_exceptions, entry["error"], selenium_exceptions.WebDriverException)
+
+            raise exception_class(entry["message"])
+
+        return self.deserialize(entry["result"])
+
+    def take_entry(self, cursors: dict, key: tuple, indices: list) -> dict:
+
+        #an entry served through one index is consumed for the other too, so exact and loose matches stay in recorded order
+        position = cursors.get(key, 0)
+
+        while position < len(indices) and self.consumed[indices[position]]:
+
+            position += 1
+
+        cursors[key] = position
+
+        if position == len(indices):
+
+            return None
+
+        self.consumed[indices[position]] = True
+
+        return self.entries[indices[position]]
+
+    def next_entry(self, target_id: str, name: str, args) -> dict:
+
+        exact_key = self.make_key(target_id, name, args)
+        loose_key = self.make_loose_key(target_id, name, args)
+
+        with self.lock:
+
+            #a call recorded with these exact arguments is only answered from its own entries
+            for cursors, key, indices in [(self.exact_cursors, exact_key, self.exact_results.get(exact_key)), (self.loose_cursors, loose_key, self.loose_results.get(loose_key))]:
+
+                if indices:
+
+                    entry = self.take_entry(cursors, key, indices)
+
+                    #the last recorded result keeps being served once a call is repeated more often than recorded
+                    return entry if entry is not None else self.entries[indices[-1]]
+
+        raise ReplayMismatchError(f"No recorded result for {name} on {target_id} with arguments {args}")
+
+    def serialize(self, value):
+
+        if isinstance(value, ReplayElement):
+
+            return {"__element__": value.id}
+
+        if isinstance(value, (list, tuple)):
+
+            return [self.serialize(item) for item in value]
+
+        if isinstance(value, dict):
+
+            return {key: self.serialize(item) for key, item in value.items()}
+
+        return value
+
+    def deserialize(self, value):
+
+        if isinstance(value, dict) and "__element__" in value:
+
+            return ReplayElement(self, value["__element__"])
+
+        if isinstance(value, list):
+
+            return [self.deserialize(item) for item in value]
+
+        if isinstance(value, dict):
+
+            return {key: self.deserialize(item) for key, item in value.items()}
+
+        return value
+
+    def quit(self) -> None:
+
+        pass
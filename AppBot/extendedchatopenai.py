@@ -1,21 +1,26 @@
-import langchain
 from langchain_openai import ChatOpenAI
+from llm_cache import PersistentLLMCache
 import os
 
 class ExtendedChatOpenAI(ChatOpenAI):
 
-    def __init__(self, model: str = "gpt-4", api_key_filename: str= None, **kwargs):
-        
+    def __init__(self, model: str = "gpt-4", api_key_filename: str= None, cache_path: str = None, replay_only: bool = False, **kwargs):
+
+        #responses are cached on disk when a cache path is given; replay-only fails on any uncached request
+        if cache_path is not None:
+
+            kwargs["cache"] = PersistentLLMCache(database_path=cache_path, replay_only=replay_only)
+
         if "OPENAI_API_KEY" in os.environ:
 
             super().__init__(model=model, api_key=os.environ["OPENAI_API_KEY"], **kwargs)
-        
+
         else:
 
-            if api_key_filepath is None:
-                
-                raise ValueError("api_key_filepath is required if OPENAI_API_KEY is not in the environment")
-            
+            if api_key_filename is None:
+
+                raise ValueError("api_key_filename is required if OPENAI_API_KEY is not in the environment")
+
             api_key = self.load_api_key_from_file(api_key_filename)
 
             super().__init__(model=model, api_key=api_key, **kwargs)
@@ -24,4 +29,12 @@ class ExtendedChatOpenAI(ChatOpenAI):
 
         with open(f"secrets/{filename}", "r") as f:
 
-            return f.read().strip()
\ No newline at end of file
+            return f.read().strip()
+
+    def get_cache_stats(self) -> dict:
+
+        if isinstance(self.cache, PersistentLLMCache):
+
+            return self.cache.get_stats()
+
+        return {}
@@ -0,0 +1,114 @@
+import difflib
+import re
+
+#words in field labels that carry no meaning for matching ("Enter your email" -> "email")
+STOPWORDS = {"your", "enter", "please", "the", "a", "an", "of", "input", "field", "required"}
+
+#alternative names for common profile fields, keyed by the normalized profile field name
+SYNONYMS = {
+    "first name": ["given name", "fname", "first", "forename"],
+    "last name": ["surname", "family name", "lname", "last"],
+    "email": ["email address", "e mail", "mail"],
+    "phone": ["phone number", "mobile", "mobile number", "telephone", "cell", "cell phone"],
+    "street": ["street address", "address line 1", "address 1", "address"],
+    "city": ["town", "city town"],
+    "state": ["province", "region", "state province"],
+    "zip": ["zip code", "postal code", "postcode", "post code"]
+}
+
+class ProfileFieldMatcher:
+
+    def __init__(self, applicant_profile, threshold: float = 0.85) -> None:
+
+        self.applicant_profile = applicant_profile
+
+        #minimum similarity for a field to be filled without the LLM
+        self.threshold = threshold
+
+        #every name and synonym of a profile field -> its paths; synonyms only count when a label equals them
+        self.index = {}
+
+        #names of the profile fields themselves -> their paths; only these are matched approximately
+        self.fuzzy_index = {}
+
+        self.build_index()
+
+    def normalize(self, key: str) -> str:
+
+        #split camelCase and separators: "contactInfo.firstName" / "first-name" / "First_Name" -> "first name"
+        key = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", key)
+        words = re.split(r"[^a-zA-Z0-9]+", key.lower())
+
+        return " ".join(word for word in words if word and word not in STOPWORDS)
+
+    def build_index(self) -> None:
+
+        for path, value in self.applicant_profile.get_flattened_fields().items():
+
+            #only plain, non-empty values can be typed into a text field
+            if isinstance(value, bool) or value is None or not isinstance(value, (str, int, float)) or str(value).strip() == "":
+
+                continue
+
+            segments = [segment for segment in path.split(".") if not segment.isdigit()]
+
+            names = {self.normalize(segments[-1])}
+
+            if len(segments) > 1:
+
+                names.add(self.normalize(" ".join(segments[-2:])))
+
+            for name in names:
+
+                self.fuzzy_index.setdefault(name, set()).add(path)
+
+            #a synonym close to another field's label is a different field ("mailing address" is not "email address")
+            for name in list(names):
+
+                names.update(SYNONYMS.get(name, []))
+
+            for name in names:
+
+                self.index.setdefault(name, set()).add(path)
+
+    def get_numbers(self, name: str) -> list:
+
+        return re.findall(r"\d+", name)
+
+    def match(self, field_key: str) -> tuple:
+
+        normalized_key = self.normalize(field_key)
+
+        if not normalized_key:
+
+            return None
+
+        scores = {path: 1.0 for path in self.index.get(normalized_key, [])}
+
+        for name, paths in self.fuzzy_index.items():
+
+            #similar names with different numbers are different fields ("address line 2" is not "address line 1")
+            if self.get_numbers(name) != self.get_numbers(normalized_key):
+
+                continue
+
+            score = difflib.SequenceMatcher(None, name, normalized_key).ratio()
+
+            for path in paths:
+
+                scores[path] = max(scores.get(path, 0.0), score)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+        if len(ranked) == 0 or ranked[0][1] < self.threshold:
+
+            return None
+
+        #two different profile fields matching equally well is ambiguous; leave it to the LLM
+        if len(ranked) > 1 and ranked[1][1] == ranked[0][1]:
+
+            return None
+
+        path, score = ranked[0]
+
+        return path, str(self.applicant_profile.get_flattened_fields()[path]), score
@@ -0,0 +1,235 @@
+from langchain_core.callbacks import BaseCallbackHandler
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+
+#checkpoints keep every observation in full; the resumed agent is shown each one up to this length
+RESUME_OBSERVATION_CHARS = 300
+
+class JobQueue:
+
+    def __init__(self, database_path: str = "../jobs.sqlite", max_attempts: int = 3, lease_seconds: float = 600.0, owner: str = None) -> None:
+
+        self.database_path = database_path
+
+        #a failed job goes back to pending until it has been attempted this many times
+        self.max_attempts = max_attempts
+
+        #a claimed job belongs to this process until its lease runs out; every checkpoint renews it
+        self.lease_seconds = lease_seconds
+        self.owner = owner if owner is not None else f"{socket.gethostname()}:{os.getpid()}"
+
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        self.connection_lock = threading.Lock()
+
+        with self.connection_lock:
+
+            #a posting is queued at most once per applicant and queue
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "job_id INTEGER PRIMARY KEY AUTOINCREMENT, queue TEXT NOT NULL, applicant_id TEXT NOT NULL, job_url TEXT NOT NULL, "
+                "status TEXT NOT NULL DEFAULT 'pending', attempts INTEGER NOT NULL DEFAULT 0, failures INTEGER NOT NULL DEFAULT 0, last_error TEXT, checkpoint TEXT, "
+                "owner TEXT, lease_expires REAL, created REAL NOT NULL, started REAL, finished REAL, seconds REAL, total_cost REAL, "
+                "UNIQUE (queue, applicant_id, job_url))"
+            )
+            self.connection.execute("CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (queue, status, job_id)")
+            self.connection.commit()
+
+    def enqueue(self, jobs: list, queue: str = "default") -> int:
+
+        #jobs are (applicant_id, job_url) pairs; returns the number of jobs that were not already queued
+        with self.connection_lock, self.connection:
+
+            before = self.connection.total_changes
+
+            self.connection.executemany(
+                "INSERT OR IGNORE INTO jobs (queue, applicant_id, job_url, created) VALUES (?, ?, ?, ?)",
+                [(queue, applicant_id, job_url, time.time()) for applicant_id, job_url in jobs]
+            )
+
+            return self.connection.total_changes - before
+
+    def recover(self, queue: str = "default") -> int:
+
+        #jobs whose owner stopped renewing their lease are pending again, and keep their checkpoints; jobs of live workers are left alone
+        with self.connection_lock, self.connection:
+
+            return self.connection.execute(
+                "UPDATE jobs SET status = 'pending', owner = NULL, lease_expires = NULL WHERE queue = ? AND status = 'running' AND (lease_expires IS NULL OR lease_expires < ?)",
+                (queue, time.time())
+            ).rowcount
+
+    def claim(self, queue: str = "default") -> dict:
+
+        #returns the oldest pending job, now marked running, or None if there is none
+        with self.connection_lock, self.connection:
+
+            #a job whose owner died while running it is claimed again once its lease has expired
+            row = self.connection.execute(
+                "SELECT * FROM jobs WHERE queue = ? AND (status = 'pending' OR (status = 'running' AND lease_expires < ?)) ORDER BY job_id LIMIT 1", (queue, time.time())
+            ).fetchone()
+
+            if row is None:
+
+                return None
+
+            self.connection.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, owner = ?, lease_expires = ?, started = ? WHERE job_id = ?",
+                (self.owner, time.time() + self.lease_seconds, time.time(), row["job_id"])
+            )
+
+        job = dict(row)
+        job["attempts"] += 1
+        job["checkpoint"] = json.loads(job["checkpoint"]) if job["checkpoint"] else None
+
+        return job
+
+    def save_checkpoint(self, job_id: int, checkpoint: dict) -> None:
+
+        with self.connection_lock, self.connection:
+
+            self.connection.execute(
+                "UPDATE jobs SET checkpoint = ?, lease_expires = ? WHERE job_id = ? AND owner = ?", (json.dumps(checkpoint), time.time() + self.lease_seconds, job_id, self.owner)
+            )
+
+    def complete(self, job_id: int, result: dict) -> None:
+
+        with self.connection_lock, self.connection:
+
+            self.connection.execute(
+                "UPDATE jobs SET status = 'completed', owner = NULL, lease_expires = NULL, finished = ?, seconds = ?, total_cost = ?, last_error = NULL WHERE job_id = ?",
+                (time.time(), result.get("seconds"), result.get("total_cost"), job_id)
+            )
+
+    def fail(self, job_id: int, error: str, retry: bool = True) -> bool:
+
+        #returns True if the job will be retried
+        with self.connection_lock, self.connection:
+
+            attempts = self.connection.execute("SELECT attempts FROM jobs WHERE job_id = ?", (job_id,)).fetchone()["attempts"]
+
+            retry = retry and attempts < self.max_attempts
+
+            self.connection.execute(
+                "UPDATE jobs SET status = ?, owner = NULL, lease_expires = NULL, failures = failures + 1, finished = ?, last_error = ? WHERE job_id = ?", ("pending" if retry else "failed", time.time(), error, job_id)
+            )
+
+        return retry
+
+    def count_pending(self, queue: str = "default") -> int:
+
+        with self.connection_lock:
+
+            return self.connection.execute("SELECT COUNT(*) FROM jobs WHERE queue = ? AND status IN ('pending', 'running')", (queue,)).fetchone()[0]
+
+    def get_stats(self, queue: str = "default") -> dict:
+
+        with self.connection_lock:
+
+            counts = {row["status"]: row["count"] for row in self.connection.execute("SELECT status, COUNT(*) AS count FROM jobs WHERE queue = ? GROUP BY status", (queue,))}
+
+            row = self.connection.execute(
+                "SELECT SUM(attempts) AS attempts, SUM(failures) AS failures, "
+                "SUM(checkpoint IS NOT NULL AND status != 'completed') AS checkpointed, MIN(started) AS first_started, MAX(finished) AS last_finished, "
+                "AVG(CASE WHEN status = 'completed' THEN seconds END) AS average_seconds, SUM(total_cost) AS total_cost "
+                "FROM jobs WHERE queue = ?",
+                (queue,)
+            ).fetchone()
+
+        elapsed = row["last_finished"] - row["first_started"] if row["first_started"] is not None and row["last_finished"] is not None else 0.0
+
+        return {
+            "queue": queue,
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "completed": counts.get("completed", 0),
+            "failed": counts.get("failed", 0),
+            "attempts": row["attempts"] or 0,
+            "failures": row["failures"] or 0,
+            "checkpointed": row["checkpointed"] or 0,
+            "average_seconds": row["average_seconds"] or 0.0,
+            "total_cost": row["total_cost"] or 0.0,
+            "applications_per_minute": 60 * counts.get("completed", 0) / elapsed if elapsed > 0 else 0.0
+        }
+
+class CheckpointCallbackHandler(BaseCallbackHandler):
+
+    def __init__(self, job_queue: JobQueue, job: dict, selenium_engine, read_only_tools: set = None) -> None:
+
+        self.job_queue = job_queue
+        self.job_id = job["job_id"]
+        self.selenium_engine = selenium_engine
+
+        #only tools that change the page or the form are followed by a checkpoint
+        self.read_only_tools = read_only_tools if read_only_tools is not None else set()
+
+        #steps of earlier attempts are carried over, so a job retried twice still knows what its first attempt did
+        previous = job.get("checkpoint") or {}
+
+        self.checkpoint = {"url": previous.get("url"), "form_values": previous.get("form_values", {}), "steps": list(previous.get("steps", []))}
+
+        self.open_runs = {}
+        self.lock = threading.Lock()
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+
+        self.open_runs[run_id] = {"tool": serialized.get("name"), "tool_input": input_str}
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+
+        step = self.open_runs.pop(run_id, None)
+
+        if step is None:
+
+            return
+
+        step["observation"] = str(output)
+
+        with self.lock:
+
+            self.checkpoint["steps"].append(step)
+
+            if step["tool"] not in self.read_only_tools and self.selenium_engine.has_driver():
+
+                #tool callbacks can run on executor threads, so the driver is only read under the engine's lock
+                self.checkpoint.update(self.selenium_engine.call_with_driver_lock(self.selenium_engine.get_checkpoint_state))
+
+            self.job_queue.save_checkpoint(self.job_id, self.checkpoint)
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+
+        self.open_runs.pop(run_id, None)
+
+def format_resume_input(checkpoint: dict, restored: list, step_limit: int = 30) -> str:
+
+    #tells the agent where a retried application stands, in place of the scratchpad of the interrupted attempt
+    lines = ["This application was interrupted and has been resumed."]
+
+    if checkpoint.get("url"):
+
+        lines.append(f"The browser is back on the last page that was reached: {checkpoint['url']}")
+
+    if restored:
+
+        lines.append("These fields were filled out again with their earlier values: " + ", ".join(restored))
+
+        #only the URL and the field values are restored, so a form that keeps its steps in page state starts over at its first step
+        lines.append("If the page does not show these fields, the form has started over; fill it out again from what it shows.")
+
+    steps = checkpoint.get("steps", [])
+
+    if steps:
+
+        lines.append(f"The last {min(len(steps), step_limit)} of {len(steps)} steps taken before the interruption:")
+
+        for step in steps[-step_limit:]:
+
+            lines.append(f"- {step['tool']}({step['tool_input']}) -> {step['observation'][:RESUME_OBSERVATION_CHARS]}")
+
+    lines.append("Continue from this page; do not repeat pages that were already submitted.")
+
+    return "\n".join(lines)
@@ -0,0 +1,158 @@
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+#message fields that differ between otherwise identical runs (run ids, usage, server metadata)
+VOLATILE_MESSAGE_FIELDS = ["id", "response_metadata", "usage_metadata"]
+
+class CacheMissError(Exception):
+
+    pass
+
+class PersistentLLMCache(BaseCache):
+
+    def __init__(self, database_path: str = "llm_cache.sqlite", max_entries: int = 10000, max_age_seconds: float = None, replay_only: bool = False) -> None:
+
+        self.database_path = database_path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+
+        #in replay-only mode a miss raises instead of falling through to the API
+        self.replay_only = replay_only
+
+        self.hits = 0
+        self.misses = 0
+
+        self.lock = threading.Lock()
+
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, generations TEXT NOT NULL, created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    def normalize_prompt(self, prompt: str) -> str:
+
+        try:
+
+            serialized = json.loads(prompt)
+
+        except ValueError:
+
+            return prompt
+
+        return json.dumps(self.strip_volatile_fields(serialized), sort_keys=True)
+
+    def strip_volatile_fields(self, serialized):
+
+        if isinstance(serialized, list):
+
+            return [self.strip_volatile_fields(item) for item in serialized]
+
+        if isinstance(serialized, dict):
+
+            serialized = {key: self.strip_volatile_fields(value) for key, value in serialized.items()}
+
+            #only message kwargs are stripped; the top-level "id" of a serialized object is its class path
+            if serialized.get("lc") and isinstance(serialized.get("kwargs"), dict):
+
+                serialized["kwargs"] = {key: value for key, value in serialized["kwargs"].items() if key not in VOLATILE_MESSAGE_FIELDS}
+
+        return serialized
+
+    def make_key(self, prompt: str, llm_string: str) -> str:
+
+        return hashlib.sha256((self.normalize_prompt(prompt) + "\x00" + llm_string).encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt: str, llm_string: str):
+
+        key = self.make_key(prompt, llm_string)
+
+        with self.lock:
+
+            row = self.connection.execute("SELECT generations, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+
+            if row is not None and self.max_age_seconds is not None and time.time() - row[1] > self.max_age_seconds:
+
+                self.connection.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                self.connection.commit()
+
+                row = None
+
+            if row is None:
+
+                self.misses += 1
+
+            else:
+
+                self.hits += 1
+
+                self.connection.execute("UPDATE llm_cache SET last_used_at = ? WHERE key = ?", (time.time(), key))
+                self.connection.commit()
+
+        if row is None:
+
+            if self.replay_only:
+
+                raise CacheMissError(f"No cached LLM response for this request (key {key[:12]}) and the cache is in replay-only mode.")
+
+            return None
+
+        return [loads(generation) for generation in json.loads(row[0])]
+
+    def update(self, prompt: str, llm_string: str, return_val) -> None:
+
+        key = self.make_key(prompt, llm_string)
+
+        now = time.time()
+
+        with self.lock:
+
+            self.connection.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, generations, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps([dumps(generation) for generation in return_val]), now, now)
+            )
+
+            self.evict(now)
+
+            self.connection.commit()
+
+    def evict(self, now: float) -> None:
+
+        if self.max_age_seconds is not None:
+
+            self.connection.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.max_age_seconds,))
+
+        if self.max_entries is not None:
+
+            #least recently used entries go first
+            self.connection.execute(
+                "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self, **kwargs) -> None:
+
+        with self.lock:
+
+            self.connection.execute("DELETE FROM llm_cache")
+            self.connection.commit()
+
+    def get_stats(self) -> dict:
+
+        with self.lock:
+
+            entries = self.connection.execute("SELECT COUNT(*) FROM llm_cache").fetchone()[0]
+
+        lookups = self.hits + self.misses
+
+        return {
+            "entries": entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
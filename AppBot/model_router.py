@@ -0,0 +1,201 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.outputs import ChatResult, LLMResult
+from langchain_core.pydantic_v1 import Field
+from langchain_community.callbacks.manager import openai_callback_var
+from langchain_community.callbacks.openai_info import MODEL_COST_PER_1K_TOKENS, get_openai_token_cost_for_model, standardize_model_name
+from llm_cache import PersistentLLMCache
+from typing import Optional
+import re
+
+#lines of a tool result that start with one of these report a failure, and send the next step to the large model:
+#the engine's failure results, its report of new messages after an action, and the agent's answer to an unknown tool
+TOOL_ERROR_PATTERNS = [
+    r"Error (entering text into|uploading file)",
+    r"(Text input field|Select element|Button|Link|File upload element) '.*' not found on the current webpage",
+    r"Option '.*' not found for select element",
+    r"The following text input fields could not be filled out",
+    r"Page \d+ does not exist",
+    r"Document must be either",
+    r"The applicant has no '.*' document",
+    r"New messages on the page:",
+    r".* is not a valid tool, try one of"
+]
+
+TOOL_ERROR_REGEX = re.compile("^(" + "|".join(TOOL_ERROR_PATTERNS) + ")", re.MULTILINE)
+
+class BudgetExceededError(Exception):
+
+    pass
+
+def get_cost(llm_output: dict) -> float:
+
+    #priced exactly as get_openai_callback prices a response; unknown models cost nothing
+    token_usage = (llm_output or {}).get("token_usage", {})
+    model_name = standardize_model_name((llm_output or {}).get("model_name", ""))
+
+    if model_name not in MODEL_COST_PER_1K_TOKENS:
+
+        return 0.0
+
+    return (
+        get_openai_token_cost_for_model(model_name, token_usage.get("prompt_tokens", 0)) +
+        get_openai_token_cost_for_model(model_name, token_usage.get("completion_tokens", 0), is_completion=True)
+    )
+
+class ModelRouter(BaseChatModel):
+
+    #every step the small model cannot be trusted with goes to the large one; without a small model only budgets apply
+    large_model: BaseChatModel
+    small_model: Optional[BaseChatModel] = None
+
+    #limits for one application; a step is only started while the application is within both
+    token_budget: Optional[int] = None
+    cost_budget: Optional[float] = None
+
+    spent_tokens: int = 0
+    spent_cost: float = 0.0
+
+    #tier -> calls, and reason -> steps sent to the large model
+    tier_calls: dict = Field(default_factory=dict)
+    escalations: dict = Field(default_factory=dict)
+
+    @property
+    def _llm_type(self) -> str:
+
+        return "model-router"
+
+    @property
+    def _identifying_params(self) -> dict:
+
+        #part of the LLM cache key, so cached responses are only reused for the same pair of models
+        return {
+            "large_model": getattr(self.large_model, "model_name", self.large_model._llm_type),
+            "small_model": getattr(self.small_model, "model_name", self.small_model._llm_type) if self.small_model is not None else None
+        }
+
+    def check_budget(self) -> None:
+
+        if self.token_budget is not None and self.spent_tokens >= self.token_budget:
+
+            raise BudgetExceededError(f"Token budget of {self.token_budget} exhausted after {self.spent_tokens} tokens.")
+
+        if self.cost_budget is not None and self.spent_cost >= self.cost_budget:
+
+            raise BudgetExceededError(f"Cost budget of ${self.cost_budget:.4f} exhausted after ${self.spent_cost:.4f}.")
+
+    def choose_tier(self, messages: list) -> tuple:
+
+        #returns the tier and the reason for it; routing only depends on the prompt, so cached responses stay valid
+        if self.small_model is None:
+
+            return "large", "no small model"
+
+        tool_results = []
+
+        for message in reversed(messages):
+
+            if not isinstance(message, ToolMessage):
+
+                break
+
+            tool_results.append(str(message.content))
+
+        if any(TOOL_ERROR_REGEX.search(result) for result in tool_results):
+
+            return "large", "tool error"
+
+        return "small", "first step" if not any(isinstance(message, AIMessage) for message in messages) else "routine step"
+
+    def get_escalation_reason(self, result: ChatResult, tools: list) -> str:
+
+        #returns why the small model's response cannot be used, or None if it can
+        message = result.generations[0].message
+
+        if getattr(message, "invalid_tool_calls", None):
+
+            return "invalid tool call"
+
+        if not message.tool_calls:
+
+            #finishing an application is left to the large model
+            return "final answer" if str(message.content).strip() else "empty response"
+
+        parameters = {tool["function"]["name"]: tool["function"].get("parameters", {}) for tool in tools or []}
+
+        for tool_call in message.tool_calls:
+
+            if parameters and tool_call["name"] not in parameters:
+
+                return "unknown tool"
+
+            if set(parameters.get(tool_call["name"], {}).get("required", [])) - set(tool_call["args"]):
+
+                return "missing arguments"
+
+        return None
+
+    def call_model(self, tier: str, messages: list, stop = None, run_manager = None, **kwargs) -> ChatResult:
+
+        self.check_budget()
+
+        model = self.small_model if tier == "small" else self.large_model
+
+        #the tier's usage is reported through the router's own run, which returns the tier's llm_output
+        result = model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+
+        self.spent_tokens += (result.llm_output or {}).get("token_usage", {}).get("total_tokens", 0)
+        self.spent_cost += get_cost(result.llm_output)
+
+        self.tier_calls[tier] = self.tier_calls.get(tier, 0) + 1
+
+        return result
+
+    def report_discarded_usage(self, result: ChatResult) -> None:
+
+        #a discarded small-model response is still paid for; it is counted by get_openai_callback like any other call
+        openai_callback = openai_callback_var.get()
+
+        if openai_callback is not None and result.llm_output is not None:
+
+            openai_callback.on_llm_end(LLMResult(generations=[], llm_output=result.llm_output))
+
+    def _generate(self, messages, stop = None, run_manager = None, **kwargs) -> ChatResult:
+
+        tier, reason = self.choose_tier(messages)
+
+        if tier == "small":
+
+            result = self.call_model("small", messages, stop, run_manager, **kwargs)
+
+            reason = self.get_escalation_reason(result, kwargs.get("tools"))
+
+            if reason is None:
+
+                return result
+
+            self.report_discarded_usage(result)
+
+        if self.small_model is not None:
+
+            self.escalations[reason] = self.escalations.get(reason, 0) + 1
+
+        return self.call_model("large", messages, stop, run_manager, **kwargs)
+
+    def get_routing_stats(self) -> dict:
+
+        return {
+            "small_calls": self.tier_calls.get("small", 0),
+            "large_calls": self.tier_calls.get("large", 0),
+            "escalations": dict(self.escalations),
+            "spent_tokens": self.spent_tokens,
+            "spent_cost": self.spent_cost
+        }
+
+    def get_cache_stats(self) -> dict:
+
+        if isinstance(self.cache, PersistentLLMCache):
+
+            return self.cache.get_stats()
+
+        return {}
@@ -0,0 +1,127 @@
+from dom_snapshot import READINESS_INSTRUMENT_SCRIPT, READINESS_POLL_SCRIPT
+from selenium.common.exceptions import WebDriverException
+import time
+
+class PageReadiness:
+
+    def __init__(self, quiet_period: float = 0.3, poll_interval: float = 0.05, min_timeout: float = 1.0, max_timeout: float = 10.0, timeout_factor: float = 3.0, smoothing: float = 0.3, pending_timeout: float = 5.0) -> None:
+
+        #the page is settled once it is loaded, has no pending fetch/XHR requests and has not mutated for quiet_period seconds
+        self.quiet_period = quiet_period
+        self.poll_interval = poll_interval
+
+        #the timeout adapts to the page: a multiple of the moving average of recent settle times, within bounds
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.timeout_factor = timeout_factor
+        self.smoothing = smoothing
+        self.average_settle_seconds = None
+
+        #a page with requests in flight is given at least this long, however quickly earlier pages settled
+        self.pending_timeout = min(pending_timeout, max_timeout)
+
+        #(document, activity count) when the last wait ended; an action that changed neither needs no quiet period
+        self.last_activity = None
+
+    def get_timeout(self, pending_requests: int = 0) -> float:
+
+        if self.average_settle_seconds is None:
+
+            return self.max_timeout
+
+        timeout = min(max(self.timeout_factor * self.average_settle_seconds, self.min_timeout), self.max_timeout)
+
+        return max(timeout, self.pending_timeout) if pending_requests else timeout
+
+    def install(self, driver) -> None:
+
+        #chrome runs the instrumentation before any page script, so requests made while a document loads are counted too;
+        #other drivers instrument each document on its first poll
+        if getattr(driver, "readiness_installed", False) is True:
+
+            return
+
+        try:
+
+            driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": READINESS_INSTRUMENT_SCRIPT})
+
+            driver.readiness_installed = True
+
+        except Exception:
+
+            pass
+
+    def poll(self, driver, start: bool = False) -> dict:
+
+        try:
+
+            return driver.execute_script(READINESS_POLL_SCRIPT, start)
+
+        except WebDriverException:
+
+            #scripts fail while the browser swaps documents
+            return None
+
+    def is_settled(self, state: dict) -> bool:
+
+        return (
+            state is not None and state["ready_state"] == "complete" and not state["navigating"]
+            and state["pending_requests"] == 0 and state["quiet_ms"] >= 1000 * self.quiet_period
+        )
+
+    def is_unchanged(self, state: dict) -> bool:
+
+        return (
+            state is not None and state["ready_state"] == "complete" and not state["navigating"] and state["pending_requests"] == 0
+            and self.last_activity is not None and (state.get("document_id"), state.get("activity")) == self.last_activity
+        )
+
+    def wait(self, driver, expect_changes: bool = False) -> dict:
+
+        start_time = time.perf_counter()
+        timeout = self.get_timeout()
+        polls = 0
+
+        while True:
+
+            state = self.poll(driver, start=polls == 0)
+            polls += 1
+
+            #an action expected to change the page may start doing so after a timeout or debounce, so it always waits out the quiet period
+            settled = self.is_settled(state) or (polls == 1 and not expect_changes and self.is_unchanged(state))
+            elapsed = time.perf_counter() - start_time
+
+            if state is not None:
+
+                timeout = max(timeout, self.get_timeout(state["pending_requests"]))
+
+            if settled or elapsed >= timeout:
+
+                break
+
+            #an otherwise idle page only needs to stay quiet for the rest of the quiet period, so poll again once it has
+            if state is not None and state["ready_state"] == "complete" and not state["navigating"] and state["pending_requests"] == 0:
+
+                delay = max(self.quiet_period - state["quiet_ms"] / 1000, self.poll_interval)
+
+            else:
+
+                delay = self.poll_interval
+
+            time.sleep(min(delay, max(timeout - elapsed, 0)))
+
+        seconds = time.perf_counter() - start_time
+
+        self.last_activity = (state.get("document_id"), state.get("activity")) if state is not None and state.get("activity") is not None else None
+
+        self.average_settle_seconds = seconds if self.average_settle_seconds is None else (
+            self.smoothing * seconds + (1 - self.smoothing) * self.average_settle_seconds
+        )
+
+        return {
+            "settled": settled,
+            "seconds": seconds,
+            "polls": polls,
+            "timeout": timeout,
+            "pending_requests": state["pending_requests"] if state is not None else None
+        }
@@ -0,0 +1,231 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import json
+import os
+import sqlite3
+import threading
+
+#documents an applicant can upload, and their file names in an applicant directory
+DOCUMENT_FILENAMES = {"resume": "resume.pdf", "transcript": "transcript.pdf"}
+
+class ProfileStore(ABC):
+
+    def __init__(self, cache_size: int = 256) -> None:
+
+        #most recently used profiles, so workers can switch applicants without reloading them
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+
+    def get_profile(self, applicant_id: str) -> dict:
+
+        with self.lock:
+
+            if applicant_id in self.cache:
+
+                self.hits += 1
+                self.cache.move_to_end(applicant_id)
+
+                return self.cache[applicant_id]
+
+            self.misses += 1
+
+        profile = self.load_profile(applicant_id)
+
+        with self.lock:
+
+            self.cache[applicant_id] = profile
+            self.cache.move_to_end(applicant_id)
+
+            while len(self.cache) > self.cache_size:
+
+                self.cache.popitem(last=False)
+
+        return profile
+
+    def invalidate(self, applicant_id: str) -> None:
+
+        with self.lock:
+
+            self.cache.pop(applicant_id, None)
+
+    def get_document_path(self, applicant_id: str, document: str) -> str:
+
+        #returns None if the document is unknown or its file does not exist
+        if document not in DOCUMENT_FILENAMES:
+
+            return None
+
+        document_path = self.find_document_path(applicant_id, document)
+
+        if document_path is None or not os.path.isfile(document_path):
+
+            return None
+
+        return os.path.abspath(document_path)
+
+    def import_directory(self, applicants_dir: str) -> list:
+
+        applicants = []
+
+        for applicant_id in sorted(os.listdir(applicants_dir)):
+
+            applicant_dir = os.path.join(applicants_dir, applicant_id)
+            profile_path = os.path.join(applicant_dir, f"{applicant_id}.json")
+
+            if not os.path.isfile(profile_path):
+
+                continue
+
+            #one broken profile should not keep the rest of the directory from being imported
+            try:
+
+                with open(profile_path, "r") as f:
+
+                    profile = json.load(f)
+
+            except (OSError, ValueError) as e:
+
+                print(f"[profile_store] Skipping {profile_path}: {e}")
+
+                continue
+
+            documents = {
+                document: os.path.abspath(os.path.join(applicant_dir, filename))
+                for document, filename in DOCUMENT_FILENAMES.items() if os.path.isfile(os.path.join(applicant_dir, filename))
+            }
+
+            applicants.append((applicant_id, profile, documents))
+
+        self.save_profiles(applicants)
+
+        for applicant_id, _, _ in applicants:
+
+            self.invalidate(applicant_id)
+
+        return [applicant_id for applicant_id, _, _ in applicants]
+
+    def get_stats(self) -> dict:
+
+        with self.lock:
+
+            return {"cached_profiles": len(self.cache), "hits": self.hits, "misses": self.misses}
+
+    @abstractmethod
+    def load_profile(self, applicant_id: str) -> dict:
+
+        pass
+
+    @abstractmethod
+    def find_document_path(self, applicant_id: str, document: str) -> str:
+
+        pass
+
+    @abstractmethod
+    def save_profiles(self, applicants: list) -> None:
+
+        pass
+
+    @abstractmethod
+    def list_applicants(self) -> list:
+
+        pass
+
+class FilesystemProfileStore(ProfileStore):
+
+    def __init__(self, applicants_dir: str = "../applicants", cache_size: int = 256) -> None:
+
+        super().__init__(cache_size=cache_size)
+
+        self.applicants_dir = applicants_dir
+
+    def load_profile(self, applicant_id: str) -> dict:
+
+        with open(os.path.join(self.applicants_dir, applicant_id, f"{applicant_id}.json"), "r") as f:
+
+            return json.load(f)
+
+    def find_document_path(self, applicant_id: str, document: str) -> str:
+
+        return os.path.join(self.applicants_dir, applicant_id, DOCUMENT_FILENAMES[document])
+
+    def save_profiles(self, applicants: list) -> None:
+
+        for applicant_id, profile, documents in applicants:
+
+            applicant_dir = os.path.join(self.applicants_dir, applicant_id)
+
+            os.makedirs(applicant_dir, exist_ok=True)
+
+            with open(os.path.join(applicant_dir, f"{applicant_id}.json"), "w") as f:
+
+                json.dump(profile, f, indent=4)
+
+    def list_applicants(self) -> list:
+
+        return sorted(
+            applicant_id for applicant_id in os.listdir(self.applicants_dir)
+            if os.path.isfile(os.path.join(self.applicants_dir, applicant_id, f"{applicant_id}.json"))
+        )
+
+class SQLiteProfileStore(ProfileStore):
+
+    def __init__(self, database_path: str = "../applicants.sqlite", cache_size: int = 256) -> None:
+
+        super().__init__(cache_size=cache_size)
+
+        self.database_path = database_path
+
+        self.connection = sqlite3.connect(database_path, check_same_thread=False)
+        self.connection_lock = threading.Lock()
+
+        with self.connection_lock:
+
+            self.connection.execute("CREATE TABLE IF NOT EXISTS profiles (applicant_id TEXT PRIMARY KEY, profile TEXT NOT NULL)")
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents (applicant_id TEXT NOT NULL, document TEXT NOT NULL, path TEXT NOT NULL, PRIMARY KEY (applicant_id, document))"
+            )
+            self.connection.commit()
+
+    def load_profile(self, applicant_id: str) -> dict:
+
+        with self.connection_lock:
+
+            row = self.connection.execute("SELECT profile FROM profiles WHERE applicant_id = ?", (applicant_id,)).fetchone()
+
+        if row is None:
+
+            raise KeyError(f"Applicant '{applicant_id}' not found in {self.database_path}")
+
+        return json.loads(row[0])
+
+    def find_document_path(self, applicant_id: str, document: str) -> str:
+
+        with self.connection_lock:
+
+            row = self.connection.execute("SELECT path FROM documents WHERE applicant_id = ? AND document = ?", (applicant_id, document)).fetchone()
+
+        return row[0] if row is not None else None
+
+    def save_profiles(self, applicants: list) -> None:
+
+        #one transaction for the whole batch
+        with self.connection_lock, self.connection:
+
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO profiles (applicant_id, profile) VALUES (?, ?)",
+                [(applicant_id, json.dumps(profile)) for applicant_id, profile, _ in applicants]
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO documents (applicant_id, document, path) VALUES (?, ?, ?)",
+                [(applicant_id, document, path) for applicant_id, _, documents in applicants for document, path in documents.items()]
+            )
+
+    def list_applicants(self) -> list:
+
+        with self.connection_lock:
+
+            return [row[0] for row in self.connection.execute("SELECT applicant_id FROM profiles ORDER BY applicant_id")]
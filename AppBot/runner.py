@@ -0,0 +1,678 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from appbot import AppBot
+from blocking_executor import BlockingCallExecutor
+from selenium_engine import SeleniumEngine
+from profile_store import FilesystemProfileStore, SQLiteProfileStore
+from browser_profile import get_browser_rss
+from browser_tabs import TabPool
+from job_queue import CheckpointCallbackHandler, JobQueue, format_resume_input
+from model_router import BudgetExceededError
+import argparse
+import asyncio
+import functools
+import itertools
+import queue
+import threading
+import time
+
+class WebDriverPool:
+
+    def __init__(self, size: int, driver_factory = None) -> None:
+
+        self.size = size
+        self.driver_factory = driver_factory if driver_factory is not None else SeleniumEngine.create_driver
+
+        self.idle_drivers = queue.Queue()
+        self.lock = threading.Lock()
+
+        #sessions started so far, and the number currently handed out
+        self.created = 0
+        self.in_use = 0
+
+        #backpressure: callers blocked waiting for a session
+        self.waiting = 0
+        self.max_waiting = 0
+        self.acquisitions = 0
+        self.total_wait_seconds = 0.0
+
+        #browser start times, to tell cold starts apart from waiting for a busy session
+        self.startup_seconds = []
+
+    def start_driver(self):
+
+        start_time = time.perf_counter()
+
+        driver = self.driver_factory()
+
+        with self.lock:
+
+            self.startup_seconds.append(time.perf_counter() - start_time)
+
+        return driver
+
+    def prestart(self, count: int) -> int:
+
+        #starts browsers in parallel ahead of the first applications, so none of them waits for a cold start
+        with self.lock:
+
+            count = max(min(count, self.size - self.created), 0)
+
+            self.created += count
+
+        with ThreadPoolExecutor(max_workers=max(count, 1)) as executor:
+
+            futures = [executor.submit(self.start_driver) for _ in range(count)]
+
+        started = 0
+
+        for future in futures:
+
+            try:
+
+                self.idle_drivers.put(future.result())
+
+                started += 1
+
+            except Exception:
+
+                with self.lock:
+
+                    self.created -= 1
+
+        return started
+
+    def acquire(self):
+
+        start_time = time.perf_counter()
+
+        with self.lock:
+
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+
+            create_new = self.idle_drivers.empty() and self.created < self.size
+
+            if create_new:
+
+                self.created += 1
+
+        try:
+
+            driver = self.start_driver() if create_new else self.idle_drivers.get()
+
+        except Exception:
+
+            with self.lock:
+
+                self.created -= 1
+                self.waiting -= 1
+
+            raise
+
+        with self.lock:
+
+            self.waiting -= 1
+            self.in_use += 1
+            self.acquisitions += 1
+            self.total_wait_seconds += time.perf_counter() - start_time
+
+        return driver
+
+    def release(self, driver) -> None:
+
+        try:
+
+            self.clean_driver(driver)
+
+        except Exception:
+
+            #a broken session is discarded, freeing its slot for a fresh one
+            with self.lock:
+
+                self.in_use -= 1
+                self.created -= 1
+
+            self.quit_driver(driver)
+
+            return
+
+        with self.lock:
+
+            self.in_use -= 1
+
+        self.idle_drivers.put(driver)
+
+    def clean_driver(self, driver) -> None:
+
+        #return the session to a clean state before the next application uses it: one window, no cookies or storage
+        for window_handle in driver.window_handles[1:]:
+
+            driver.switch_to.window(window_handle)
+            driver.close()
+
+        driver.switch_to.window(driver.window_handles[0])
+
+        #storage belongs to the page's origin, so it is cleared before leaving the page
+        driver.execute_script("try { window.localStorage.clear(); window.sessionStorage.clear(); } catch (error) {}")
+
+        try:
+
+            #clears the cookies of every domain; delete_all_cookies only reaches the current one
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+
+        except Exception:
+
+            driver.delete_all_cookies()
+
+        driver.get("about:blank")
+
+    def get_rss(self, driver) -> int:
+
+        return get_browser_rss(driver)
+
+    def quit_driver(self, driver) -> None:
+
+        try:
+
+            driver.quit()
+
+        except Exception:
+
+            pass
+
+    def close(self) -> None:
+
+        while not self.idle_drivers.empty():
+
+            self.quit_driver(self.idle_drivers.get())
+
+    def get_stats(self) -> dict:
+
+        with self.lock:
+
+            return {
+                "sessions": self.created,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "max_waiting": self.max_waiting,
+                "average_wait_seconds": self.total_wait_seconds / self.acquisitions if self.acquisitions else 0.0,
+                "average_startup_seconds": sum(self.startup_seconds) / len(self.startup_seconds) if self.startup_seconds else 0.0
+            }
+
+class ApplicationRunner:
+
+    def __init__(self, concurrency: int = 1, verbose: bool = False, instructions: str = None, driver_pool: WebDriverPool = None, appbot_options: dict = None) -> None:
+
+        self.concurrency = concurrency
+        self.verbose = verbose
+        self.instructions = instructions
+
+        #extra keyword arguments passed to every AppBot
+        self.appbot_options = appbot_options if appbot_options is not None else {}
+
+        self.driver_pool = driver_pool if driver_pool is not None else WebDriverPool(size=concurrency)
+
+        #only used by the async runner; sized so every running application can hold a driver call
+        self.blocking_executor = BlockingCallExecutor(max_workers=concurrency)
+
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.start_time = None
+
+        #set while jobs are run from a persistent queue, which checkpoints them and retries failures
+        self.job_queue = None
+
+        #browser memory charged to each application at its end; with tabs, the browser's memory is split between them
+        self.browser_rss = []
+
+    def build_input(self, job_url: str) -> str:
+
+        input_text = f"Fill out the job application at the following URL: {job_url}"
+
+        if self.instructions:
+
+            input_text += "\n" + self.instructions
+
+        return input_text
+
+    def prepare_job(self, appbot: AppBot, job: dict) -> str:
+
+        #queued jobs checkpoint after every action; a retried one first returns to the page its last attempt reached
+        appbot.callbacks.append(CheckpointCallbackHandler(
+            self.job_queue, job, appbot.selenium_engine, read_only_tools={tool.name for tool in appbot.agent_executor.tools if (tool.metadata or {}).get("read_only")}
+        ))
+
+        checkpoint = job["checkpoint"]
+
+        if not checkpoint:
+
+            return ""
+
+        restored = appbot.selenium_engine.restore_checkpoint_state(checkpoint) if checkpoint.get("url") else []
+
+        return "\n" + format_resume_input(checkpoint, restored)
+
+    def finish_result(self, result: dict) -> None:
+
+        #an agent that ran out of iterations has not finished the application
+        if result.get("stopped_early"):
+
+            result["status"] = "failed"
+            result["error"] = "Agent stopped at the iteration limit."
+
+        else:
+
+            result["status"] = "completed"
+
+    def finish_job(self, job: dict, result: dict) -> None:
+
+        if result["status"] == "completed":
+
+            self.job_queue.complete(job["job_id"], result)
+
+        elif self.job_queue.fail(job["job_id"], result["error"], retry=result.get("retryable", True)):
+
+            result["status"] = "retrying"
+
+            with self.lock:
+
+                self.pending += 1
+
+    def run_job(self, applicant_id: str, job_url: str, job: dict = None) -> dict:
+
+        result = {"applicant_id": applicant_id, "job_url": job_url}
+
+        driver = None
+
+        start_time = time.perf_counter()
+
+        try:
+
+            driver = self.driver_pool.acquire()
+
+            #waiting for a browser is reported by the pool, not as time spent on the application
+            start_time = time.perf_counter()
+
+            appbot = AppBot(verbose=self.verbose, applicant_id=applicant_id, driver=driver, **self.appbot_options)
+
+            input_text = self.build_input(job_url)
+
+            if job is not None:
+
+                input_text += self.prepare_job(appbot, job)
+
+            result.update(appbot.invoke_agent(input_text))
+
+            self.finish_result(result)
+
+        except Exception as e:
+
+            result["status"] = "failed"
+            result["error"] = str(e)
+
+            #a retry would spend the budget again
+            result["retryable"] = not isinstance(e, BudgetExceededError)
+
+        finally:
+
+            if driver is not None:
+
+                result["browser_rss_bytes"] = self.get_rss(driver)
+
+                self.driver_pool.release(driver)
+
+        result["seconds"] = time.perf_counter() - start_time
+
+        self.record_result(result)
+
+        if job is not None:
+
+            self.finish_job(job, result)
+
+        return result
+
+    async def arun_job(self, applicant_id: str, job_url: str, semaphore: asyncio.Semaphore, job: dict = None) -> dict:
+
+        result = {"applicant_id": applicant_id, "job_url": job_url}
+
+        async with semaphore:
+
+            driver = None
+
+            start_time = time.perf_counter()
+
+            try:
+
+                driver = await self.blocking_executor.run(self.driver_pool.acquire)
+
+                start_time = time.perf_counter()
+
+                appbot = await self.blocking_executor.run(
+                    AppBot, verbose=self.verbose, applicant_id=applicant_id, driver=driver, blocking_executor=self.blocking_executor, **self.appbot_options
+                )
+
+                input_text = self.build_input(job_url)
+
+                if job is not None:
+
+                    input_text += await self.blocking_executor.run(appbot.selenium_engine.call_with_driver_lock, self.prepare_job, appbot, job)
+
+                result.update(await appbot.ainvoke_agent(input_text))
+
+                self.finish_result(result)
+
+            except Exception as e:
+
+                result["status"] = "failed"
+                result["error"] = str(e)
+                result["retryable"] = not isinstance(e, BudgetExceededError)
+
+            finally:
+
+                if driver is not None:
+
+                    result["browser_rss_bytes"] = self.get_rss(driver)
+
+                    await self.blocking_executor.run(self.driver_pool.release, driver)
+
+            result["seconds"] = time.perf_counter() - start_time
+
+        self.record_result(result)
+
+        if job is not None:
+
+            await self.blocking_executor.run(self.finish_job, job, result)
+
+        return result
+
+    def get_rss(self, driver) -> int:
+
+        #measured before the driver is released, so a browser that died mid-application must not keep it from the pool
+        try:
+
+            return self.driver_pool.get_rss(driver)
+
+        except Exception:
+
+            return None
+
+    def record_result(self, result: dict) -> dict:
+
+        with self.lock:
+
+            self.pending -= 1
+
+            if result.get("browser_rss_bytes") is not None:
+
+                self.browser_rss.append(result["browser_rss_bytes"])
+
+            if result["status"] == "completed":
+
+                self.completed += 1
+
+            else:
+
+                self.failed += 1
+
+        return result
+
+    def run(self, jobs: list) -> list:
+
+        self.start_time = time.perf_counter()
+        self.pending = len(jobs)
+
+        self.driver_pool.prestart(min(self.concurrency, len(jobs)))
+
+        results = []
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            futures = [executor.submit(self.run_job, applicant_id, job_url) for applicant_id, job_url in jobs]
+
+            for future in as_completed(futures):
+
+                results.append(future.result())
+
+                self.report_progress()
+
+        self.driver_pool.close()
+
+        return results
+
+    async def arun(self, jobs: list) -> list:
+
+        self.start_time = time.perf_counter()
+        self.pending = len(jobs)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        await self.blocking_executor.run(self.driver_pool.prestart, min(self.concurrency, len(jobs)))
+
+        results = []
+
+        for future in asyncio.as_completed([self.arun_job(applicant_id, job_url, semaphore) for applicant_id, job_url in jobs]):
+
+            results.append(await future)
+
+            self.report_progress()
+
+        await self.blocking_executor.run(self.driver_pool.close)
+
+        return results
+
+    def start_queue(self, job_queue: JobQueue, queue: str) -> int:
+
+        self.job_queue = job_queue
+
+        #jobs of a crashed run are resumed from their checkpoints once their leases have expired
+        recovered = job_queue.recover(queue)
+
+        if recovered:
+
+            print(f"[runner] {recovered} interrupted job(s) will resume from their checkpoints.")
+
+        self.start_time = time.perf_counter()
+        self.pending = job_queue.count_pending(queue)
+
+        return self.pending
+
+    def run_queue(self, job_queue: JobQueue, queue: str = "default") -> list:
+
+        self.driver_pool.prestart(min(self.concurrency, self.start_queue(job_queue, queue)))
+
+        results = []
+
+        def worker() -> None:
+
+            #failed jobs go back to the queue, so workers keep claiming until it is drained
+            while True:
+
+                job = job_queue.claim(queue)
+
+                if job is None:
+
+                    break
+
+                results.append(self.run_job(job["applicant_id"], job["job_url"], job=job))
+
+                self.report_progress()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+
+            for future in [executor.submit(worker) for _ in range(self.concurrency)]:
+
+                future.result()
+
+        self.driver_pool.close()
+
+        return results
+
+    async def arun_queue(self, job_queue: JobQueue, queue: str = "default") -> list:
+
+        count = await self.blocking_executor.run(self.start_queue, job_queue, queue)
+
+        await self.blocking_executor.run(self.driver_pool.prestart, min(self.concurrency, count))
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        results = []
+
+        async def worker() -> None:
+
+            while True:
+
+                job = await self.blocking_executor.run(job_queue.claim, queue)
+
+                if job is None:
+
+                    break
+
+                results.append(await self.arun_job(job["applicant_id"], job["job_url"], semaphore, job=job))
+
+                self.report_progress()
+
+        await asyncio.gather(*[worker() for _ in range(self.concurrency)])
+
+        await self.blocking_executor.run(self.driver_pool.close)
+
+        return results
+
+    def get_stats(self) -> dict:
+
+        elapsed = time.perf_counter() - self.start_time if self.start_time else 0.0
+
+        with self.lock:
+
+            stats = {
+                "completed": self.completed,
+                "failed": self.failed,
+                "pending": self.pending,
+                "elapsed_seconds": elapsed,
+                "applications_per_minute": 60 * (self.completed + self.failed) / elapsed if elapsed else 0.0,
+                "average_browser_rss_mb": sum(self.browser_rss) / len(self.browser_rss) / 2**20 if self.browser_rss else 0.0
+            }
+
+        stats.update({"pool_" + key: value for key, value in self.driver_pool.get_stats().items()})
+
+        return stats
+
+    def report_progress(self) -> None:
+
+        stats = self.get_stats()
+
+        print(
+            f"[runner] {stats['completed']} completed, {stats['failed']} failed, {stats['pending']} pending | "
+            f"{stats['pool_in_use']}/{stats['pool_sessions']} sessions busy, {stats['pool_waiting']} waiting "
+            f"(avg wait {stats['pool_average_wait_seconds']:.1f}s, avg startup {stats['pool_average_startup_seconds']:.1f}s) | "
+            f"{stats['average_browser_rss_mb']:.0f} MB RSS per application | {stats['applications_per_minute']:.2f} applications/min"
+        )
+
+def load_job_urls(urls_file: str) -> list:
+
+    with open(urls_file, "r") as f:
+
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-a", "--applicants", nargs="*", default=[], help="Applicant IDs to apply for")
+    parser.add_argument("--all-applicants", action="store_true", help="Apply for every applicant in the profile store")
+    parser.add_argument("--profile-db", help="SQLite profile store to load applicants from, instead of the applicants directory")
+    parser.add_argument("--import-applicants", help="Import every applicant in this directory into the profile store before running")
+    parser.add_argument("-u", "--urls", nargs="*", default=[], help="Job posting URLs")
+    parser.add_argument("-f", "--urls-file", help="File with one job posting URL per line")
+    parser.add_argument("-n", "--concurrency", type=int, default=1, help="Number of applications to run in parallel")
+    parser.add_argument("-c", "--text", help="Additional instructions for the agent")
+    parser.add_argument("--async", dest="use_async", action="store_true", help="Run applications on a single asyncio event loop")
+    parser.add_argument("--llm-cache", help="Path of a SQLite file used to cache LLM responses")
+    parser.add_argument("--replay-only", action="store_true", help="Only use cached LLM responses and fail on a cache miss")
+    parser.add_argument("--trace-dir", help="Directory of recorded form traces to record into and replay from")
+    parser.add_argument("--autofill", action="store_true", help="Fill text inputs that match applicant profile fields without the LLM")
+    parser.add_argument("--lightweight", action="store_true", help="Run headless browsers without extensions, images, fonts, media or trackers")
+    parser.add_argument("--tabs", type=int, default=0, help="Run up to this many applications as tabs of one browser, each in its own browser context")
+    parser.add_argument("--small-model", help="Send routine steps to this cheaper model, escalating to gpt-4o on errors and ambiguous responses")
+    parser.add_argument("--token-budget", type=int, help="Token budget per application")
+    parser.add_argument("--cost-budget", type=float, help="Cost budget per application in dollars")
+    parser.add_argument("--llm-base-url", help="Base URL of an OpenAI-compatible server to send LLM calls to, e.g. a local stand-in")
+    parser.add_argument("--queue", help="SQLite job queue; postings are added to it and run from it, and interrupted applications resume from their checkpoints")
+    parser.add_argument("--queue-name", default="default", help="Name of the queue within the job queue file")
+    parser.add_argument("--max-attempts", type=int, default=3, help="Attempts per queued application before it is marked failed")
+    parser.add_argument("--lease-seconds", type=float, default=600.0, help="A running job whose worker has not checkpointed for this long is taken over by another worker")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args()
+
+    #one store is shared by every worker, so its cache of hot profiles is too
+    profile_store = SQLiteProfileStore(args.profile_db) if args.profile_db else FilesystemProfileStore()
+
+    if args.import_applicants:
+
+        imported = profile_store.import_directory(args.import_applicants)
+
+        print(f"Imported {len(imported)} applicant(s) from {args.import_applicants}.")
+
+    applicants = profile_store.list_applicants() if args.all_applicants else args.applicants
+
+    job_urls = args.urls + (load_job_urls(args.urls_file) if args.urls_file else [])
+
+    jobs = list(itertools.product(applicants, job_urls))
+
+    appbot_options = {
+        "profile_store": profile_store,
+        "llm_cache_path": args.llm_cache,
+        "replay_only": args.replay_only,
+        "trace_dir": args.trace_dir,
+        "autofill": args.autofill,
+        "small_model": args.small_model,
+        "token_budget": args.token_budget,
+        "cost_budget": args.cost_budget,
+        "llm_base_url": args.llm_base_url
+    }
+
+    driver_factory = functools.partial(SeleniumEngine.create_driver, lightweight=args.lightweight)
+
+    if args.tabs > 0:
+
+        driver_pool = TabPool(size=args.concurrency, tabs_per_browser=args.tabs, driver_factory=driver_factory)
+
+    else:
+
+        driver_pool = WebDriverPool(size=args.concurrency, driver_factory=driver_factory)
+
+    runner = ApplicationRunner(concurrency=args.concurrency, verbose=args.verbose, instructions=args.text, driver_pool=driver_pool, appbot_options=appbot_options)
+
+    if args.queue:
+
+        job_queue = JobQueue(args.queue, max_attempts=args.max_attempts, lease_seconds=args.lease_seconds)
+
+        print(f"Queued {job_queue.enqueue(jobs, queue=args.queue_name)} new application(s) in {args.queue}.")
+
+        if args.use_async:
+
+            asyncio.run(runner.arun_queue(job_queue, args.queue_name))
+
+        else:
+
+            runner.run_queue(job_queue, args.queue_name)
+
+    elif args.use_async:
+
+        asyncio.run(runner.arun(jobs))
+
+    else:
+
+        runner.run(jobs)
+
+    print("Runner Complete.")
+
+    for key, value in runner.get_stats().items():
+
+        print(f"{key}: {value}")
+
+    if args.queue:
+
+        for key, value in job_queue.get_stats(args.queue_name).items():
+
+            print(f"queue_{key}: {value}")
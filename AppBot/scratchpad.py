@@ -0,0 +1,118 @@
+from action_trace import PAGE_CHANGING_TOOLS
+from token_utils import CHARS_PER_TOKEN, count_tokens
+import functools
+
+#tools whose output describes the current page and is replaced by any later call of the same tool
+LISTING_TOOLS = [
+    "Get-Text-Input-Elements",
+    "Get-Buttons",
+    "Get-HREF-Links",
+    "Get-Select-Elements",
+    "Get-Select-Element-Options",
+    "Get-File-Upload-Elements",
+    "Get-All-Text",
+    "Get-Page-Overview"
+]
+
+@functools.lru_cache(maxsize=4096)
+def count_observation_tokens(observation: str) -> int:
+
+    return count_tokens(observation)
+
+class ScratchpadCompactor:
+
+    def __init__(self, keep_recent_steps: int = 6, max_tokens: int = 12000, stale_observation_tokens: int = 200, verbose: bool = False) -> None:
+
+        #the most recent steps are always sent verbatim (unless the ceiling forces otherwise)
+        self.keep_recent_steps = keep_recent_steps
+
+        #ceiling on the total tokens of all observations in the scratchpad
+        self.max_tokens = max_tokens
+
+        #older observations are truncated to this many tokens
+        self.stale_observation_tokens = stale_observation_tokens
+
+        self.verbose = verbose
+
+    def __call__(self, intermediate_steps: list) -> list:
+
+        return self.compact(intermediate_steps)
+
+    def compact(self, intermediate_steps: list) -> list:
+
+        observations = [str(observation) for _, observation in intermediate_steps]
+
+        tokens_before = sum(count_observation_tokens(observation) for observation in observations)
+
+        stale_count = max(len(intermediate_steps) - self.keep_recent_steps, 0)
+
+        for index in range(stale_count):
+
+            action = intermediate_steps[index][0]
+
+            reason = self.get_superseded_reason(action, intermediate_steps[index + 1:])
+
+            if reason is not None:
+
+                observations[index] = f"[Output elided: {reason}]"
+
+            else:
+
+                observations[index] = self.truncate(observations[index], self.stale_observation_tokens)
+
+        #enforce the ceiling by eliding the oldest observations first, never the latest one
+        token_counts = [count_observation_tokens(observation) for observation in observations]
+
+        for index in range(len(observations) - 1):
+
+            if sum(token_counts) <= self.max_tokens:
+
+                break
+
+            if token_counts[index] > 0 and not observations[index].startswith("[Output elided"):
+
+                observations[index] = "[Output elided: scratchpad token limit reached. Call the tool again if this output is needed.]"
+                token_counts[index] = count_observation_tokens(observations[index])
+
+        #a single output over the whole ceiling is cut down to what the older steps left of it
+        if sum(token_counts) > self.max_tokens:
+
+            token_limit = max(self.max_tokens - sum(token_counts[:-1]), self.stale_observation_tokens)
+
+            observations[-1] = self.truncate(observations[-1], token_limit, "[truncated: output exceeds the scratchpad token limit. Use narrower tools or the page argument to read the rest.]")
+            token_counts[-1] = count_observation_tokens(observations[-1])
+
+        tokens_after = sum(token_counts)
+
+        if self.verbose and tokens_after < tokens_before:
+
+            print(f"Scratchpad compaction saved {tokens_before - tokens_after} tokens ({tokens_before} -> {tokens_after}).")
+
+        return [(action, observation) for (action, _), observation in zip(intermediate_steps, observations)]
+
+    def get_superseded_reason(self, action, later_steps: list) -> str:
+
+        if action.tool not in LISTING_TOOLS:
+
+            return None
+
+        for later_action, _ in later_steps:
+
+            if later_action.tool == action.tool and later_action.tool_input == action.tool_input:
+
+                return f"superseded by a later {action.tool} call."
+
+            if later_action.tool in PAGE_CHANGING_TOOLS:
+
+                return f"page listing from before a later {later_action.tool} call."
+
+        return None
+
+    def truncate(self, observation: str, token_limit: int, note: str = "[truncated older output]") -> str:
+
+        if count_observation_tokens(observation) <= token_limit:
+
+            return observation
+
+        #a character cut keeps this cheap; the token count is only approximated here
+        return observation[:token_limit * CHARS_PER_TOKEN] + " ... " + note
@@ -0,0 +1,79 @@
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from token_utils import count_tokens
+import json
+
+class ScriptedChatModel(BaseChatModel):
+
+    #one entry per agent step: a list of {"tool": name, "args": {...}} calls, or a string to finish with
+    script: list
+
+    #replaces {base_url} in tool arguments, e.g. the address of a local fixture server
+    base_url: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+
+        #the script already names the tools; there is no schema to send anywhere
+        return self
+
+    def format_args(self, args: dict) -> dict:
+
+        formatted_args = {}
+
+        for name, value in args.items():
+
+            #structured values are sent as json strings, as the LLM would (e.g. Bulk-Enter-Text)
+            if isinstance(value, (dict, list)):
+
+                value = json.dumps(value)
+
+            if isinstance(value, str):
+
+                value = value.replace("{base_url}", self.base_url)
+
+            formatted_args[name] = value
+
+        return formatted_args
+
+    def build_message(self, step: int) -> AIMessage:
+
+        if step >= len(self.script) or isinstance(self.script[step], str):
+
+            return AIMessage(content=self.script[step] if step < len(self.script) else "Done.")
+
+        tool_calls = [
+            {"name": call["tool"], "args": self.format_args(call.get("args", {})), "id": f"call_{step}_{index}"}
+            for index, call in enumerate(self.script[step])
+        ]
+
+        #older output parsers read the OpenAI wire format from additional_kwargs
+        additional_kwargs = {"tool_calls": [
+            {"id": tool_call["id"], "type": "function", "function": {"name": tool_call["name"], "arguments": json.dumps(tool_call["args"])}}
+            for tool_call in tool_calls
+        ]}
+
+        return AIMessage(content="", tool_calls=tool_calls, additional_kwargs=additional_kwargs)
+
+    def _generate(self, messages, stop = None, run_manager = None, **kwargs) -> ChatResult:
+
+        #the step is the number of assistant messages already in the prompt, so the model itself is stateless
+        step = sum(1 for message in messages if isinstance(message, AIMessage))
+
+        message = self.build_message(step)
+
+        prompt_tokens = sum(count_tokens(str(prompt_message.content)) + count_tokens(json.dumps(prompt_message.additional_kwargs)) for prompt_message in messages)
+        completion_tokens = count_tokens(json.dumps(message.additional_kwargs)) + count_tokens(str(message.content))
+
+        return ChatResult(
+            generations=[ChatGeneration(message=message)],
+            llm_output={
+                "token_usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens},
+                "model_name": "scripted"
+            }
+        )
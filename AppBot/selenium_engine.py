@@ -1,12 +1,23 @@
 from selenium import webdriver
 from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
 from selenium.webdriver.support.select import Select
-from selenium.common.exceptions import NoSuchElementException
-from langchain.agents import tool
-from langchain.tools import StructuredTool
-from langchain.pydantic_v1 import Field, create_model
+from selenium.common.exceptions import NoSuchElementException, StaleElementReferenceException, WebDriverException
+from langchain_core.tools import StructuredTool
+from tool_schemas import get_args_schema
+from dom_snapshot import ELEMENT_CATEGORIES, ELEMENT_ID_ATTRIBUTE, FILL_SCRIPT, FORM_VALUES_SCRIPT, RESOLVE_SCRIPT, SNAPSHOT_SCRIPT, TEXT_CATEGORIES, VISIBLE_TEXT_SCRIPT
+from token_utils import count_tokens, estimate_tokens_from_chars, split_into_pages
+from blocking_executor import BlockingCallExecutor, default_executor
+from action_trace import ActionTracer, PAGE_CHANGING_TOOLS, RECORDED_TOOLS, REPLAY_STOP_TOOLS
+from field_matcher import ProfileFieldMatcher
+from tracing import Tracer
+from driver_backends import RecordingDriver, ReplayDriver
+from page_readiness import PageReadiness
+from browser_profile import block_resources, configure_lightweight
+from contextlib import contextmanager
+import functools
 import json
+import threading
+import time
 
 class SeleniumEngine():
 
@@ -27,12 +38,82 @@ class SeleniumEngine():
 
     #file upload elements
     file_upload_elements = {}
+
+    #WebDriver round-trip counters
+    round_trips = 0
+    refresh_count = 0
+    last_refresh_round_trips = 0
     
-    def __init__(self, verbose: bool = False, file_upload_source_path: str = None) -> None:
+    def __init__(self, verbose: bool = False, file_upload_source_path: str = None, driver = None, blocking_executor: BlockingCallExecutor = None, text_token_budget: int = 2000, action_tracer: ActionTracer = None, field_matcher: ProfileFieldMatcher = None, document_resolver = None, tracer: Tracer = None, readiness: PageReadiness = None) -> None:
         
         self.verbose = verbose
 
+        #records spans for element refreshes and page loads
+        self.tracer = tracer
+
+        #waits for the page to settle after an action, so elements are refreshed once the next step has rendered
+        self.readiness = readiness if readiness is not None else PageReadiness()
+        self.settle_reports = []
+
+        #while a batch of tool calls runs, refreshes after actions that do not change the page wait for the end of the batch
+        self.refresh_deferred = False
+        self.deferred_actions = []
+
+        #records tool calls per form, and replays them when a traced form is seen again
+        self.action_tracer = action_tracer
+        self.page_signature = None
+        self.replaying = False
+        self.current_url = None
+
+        #tool name -> undecorated tool function, used for replay
+        self.tool_functions = {}
+
+        #fills text inputs that clearly match a profile field before the agent sees them
+        self.field_matcher = field_matcher
+        self.filled_text_inputs = set()
+        self.autofill_reports = []
+
+        #text input key -> the element id it was last seen with; a key on a new element is a new, unfilled field
+        self.text_input_ids = {}
+
+        #form -> its report in autofill_reports; a form autofilled again after a page change updates its report
+        self.autofill_forms = {}
+
+        #maximum tokens of page text returned by a single Get-All-Text call
+        self.text_token_budget = text_token_budget
+
+        #select options listed per select element in the page overview
+        self.overview_option_limit = 15
+        self.text_pages = []
+        self.text_raw_tokens = 0
+
+        #tokens of each Get-All-Text extraction against the raw page source it replaced
+        self.text_reports = []
+
+        #async tool calls run on this executor; the lock keeps them from using the driver concurrently
+        self.blocking_executor = blocking_executor if blocking_executor is not None else default_executor
+        self.driver_lock = threading.RLock()
+
         self.file_upload_source_path = file_upload_source_path
+
+        #maps a document name to a checked file path (or None), e.g. ApplicantProfile.get_document_path
+        self.document_resolver = document_resolver
+
+        #per-instance registries, so engines sharing a process never see each other's elements
+        self.reset_elements()
+
+        self.key_functions = {
+            "text_input_elements": self.get_text_input_key,
+            "buttons": self.get_button_key,
+            "href_links": self.get_link_key,
+            "select_elements": self.get_select_key,
+            "file_upload_elements": self.get_file_upload_key,
+            "headings": self.get_text_key,
+            "messages": self.get_text_key
+        }
+
+        #names of tools that only read the page; every other tool gets a page diff appended to its result
+        self.read_only_tools = set()
         
         self.tools = [
             self.create_tool(
@@ -41,52 +122,65 @@ class SeleniumEngine():
                 desc="Navigate to the provided URL. URL must be fully complete with http or https.",
                 tool_args={"url": str}
             ),
+            self.create_tool(
+                self.get_page_overview,
+                name="Get-Page-Overview",
+                desc="Get an overview of all text inputs, select elements with their options, file uploads, buttons and links on the current webpage, grouped by form section. Prefer this over the individual Get tools when looking at a new page.",
+                tool_args={},
+                read_only=True
+            ),
             self.create_tool(
                 self.get_text_input_elements,
                 name="Get-Text-Input-Elements",
                 desc="Get a list of all text input elements on the current webpage.",
-                tool_args={}
+                tool_args={},
+                read_only=True
             ),
             self.create_tool(
                 self.get_buttons,
                 name="Get-Buttons",
                 desc="Get a list of all buttons on the current webpage.",
-                tool_args={}
+                tool_args={},
+                read_only=True
             ),
             self.create_tool(
                 self.get_href_links,
                 name="Get-HREF-Links",
                 desc="Get a list of all href links on the current webpage.",
-                tool_args={}
+                tool_args={},
+                read_only=True
             ),
             self.create_tool(
                 self.get_select_elements,
                 name="Get-Select-Elements",
                 desc="Get a list of all select elements on the current webpage",
-                tool_args={}
+                tool_args={},
+                read_only=True
             ),
             self.create_tool(
                 self.get_select_element_options,
                 name="Get-Select-Element-Options",
                 desc="Get a list of all options for a select element on the current webpage.",
-                tool_args={"select_element": str}
+                tool_args={"select_element": str},
+                read_only=True
             ),
             self.create_tool(
                 self.get_file_upload_elements,
                 name="Get-File-Upload-Elements",
                 desc="Get a list of all file upload elements on the current webpage.",
-                tool_args={}
+                tool_args={},
+                read_only=True
             ),
             self.create_tool(
                 self.enter_text,
                 name="Enter-Text",
-                desc="Enter text into a text input field on the current webpage.",
+                desc="Enter text into a text input field on the current webpage. The text replaces anything already in the field.",
                 tool_args={"text_input_field": str, "text": str}
             ),
             self.create_tool(
                 self.bulk_enter_text,
                 name="Bulk-Enter-Text",
-                desc="Enter text into multiple text input fields on the current webpage. Provide a json string with the text input field as the key and the text as the value for every text input field you want to fill out.",
+                desc="Enter text into multiple text input fields on the current webpage. Provide a json string with the text input field as the key and the text as the value for every text input field you want to fill out. Each text replaces anything already in its field. If some fields cannot be filled out, the result lists them separately from the fields that were filled out.",
                 tool_args={"text_input_fields": str}
             ),
             self.create_tool(
@@ -104,8 +198,9 @@ class SeleniumEngine():
             self.create_tool(
                 self.get_all_text,
                 name="Get-All-Text",
-                desc="Get all text on the current webpage.",
-                tool_args={}
+                desc="Get the visible text on the current webpage. Long pages are split into pages; request later pages with the page argument.",
+                tool_args={"page": (int, 1)},
+                read_only=True
             ),
             self.create_tool(
                 self.set_select_element_option,
@@ -121,27 +216,340 @@ class SeleniumEngine():
             )
         ]
 
-        self.init_driver()
+        self.init_driver(driver)
+
+    def init_driver(self, driver = None) -> None:
+
+        #without a driver, the browser is only launched by the first tool that needs it
+        self.driver_instance = None
+        self.driver_startup_seconds = None
+
+        if driver is not None:
+
+            self.attach_driver(driver)
+
+    def attach_driver(self, driver) -> None:
+
+        self.driver_instance = driver
+
+        self.count_round_trips()
+
+        self.readiness.install(driver)
 
-    def init_driver(self) -> None:
+    @property
+    def webdriver(self):
+
+        if self.driver_instance is None:
+
+            with self.driver_lock:
+
+                if self.driver_instance is None:
+
+                    start_time = time.perf_counter()
+
+                    self.attach_driver(self.create_driver())
+
+                    self.driver_startup_seconds = time.perf_counter() - start_time
+
+                    if self.tracer is not None:
+
+                        self.tracer.add_span("browser_launch", "selenium", start_time, time.perf_counter())
+
+        return self.driver_instance
+
+    def has_driver(self) -> bool:
+
+        return self.driver_instance is not None
+
+    @staticmethod
+    def create_driver(headless: bool = False, backend: str = "chrome", recording_path: str = None, lightweight: bool = False):
+
+        #"record" drives chrome and saves every WebDriver call to recording_path, "replay" serves them back without a browser
+        if backend == "replay":
+
+            return ReplayDriver(recording_path)
 
         chrome_options = Options()
-        chrome_options.add_experimental_option("detach", True)
-        
-        self.webdriver = webdriver.Chrome(options=chrome_options)
-        self.webdriver.implicitly_wait(0)
 
-    def create_tool(self, tool_function, name: str = None, desc: str = None, tool_args: dict = None) -> StructuredTool:
+        #the lightweight profile is headless, without extensions, images, fonts, media or trackers
+        if lightweight:
+
+            configure_lightweight(chrome_options)
+
+        else:
+
+            chrome_options.add_experimental_option("detach", True)
+
+            if headless:
 
-        pydanticified_args = {description:(arg_type, Field(description=description)) for (description, arg_type) in tool_args.items()}
+                chrome_options.add_argument("--headless=new")
         
+        driver = webdriver.Chrome(options=chrome_options)
+        driver.implicitly_wait(0)
+
+        if lightweight:
+
+            block_resources(driver)
+
+        if backend == "record":
+
+            return RecordingDriver(driver, recording_path)
+
+        return driver
+
+    def reset_elements(self) -> None:
+
+        self.text_input_elements = {}
+        self.buttons = {}
+        self.select_elements = {}
+        self.href_links = {}
+        self.file_upload_elements = {}
+        self.headings = {}
+        self.messages = {}
+
+        #per category, the element id and CSS selectors of every key, used to re-find elements whose handles went stale
+        self.element_locators = {category: {} for category in ELEMENT_CATEGORIES}
+
+        #per category, the form section (fieldset legend or heading) of every key
+        self.element_sections = {category: {} for category in ELEMENT_CATEGORIES}
+
+    def create_tool(self, tool_function, name: str = None, desc: str = None, tool_args: dict = None, read_only: bool = False) -> StructuredTool:
+
+        self.tool_functions[name] = tool_function
+
+        if read_only:
+
+            self.read_only_tools.add(name)
+
+        wrapped_function = self.wrap_tool_function(name, tool_function)
+
         return StructuredTool.from_function(
-            func=tool_function,
+            func=wrapped_function,
+            coroutine=self.create_tool_coroutine(wrapped_function),
             name=name,
             description=desc,
-            args_schema=create_model("Model", **pydanticified_args)
+            args_schema=get_args_schema(name, tool_args),
+            metadata={"read_only": read_only}
         )
 
+    def wrap_tool_function(self, name: str, tool_function):
+
+        @functools.wraps(tool_function)
+        def wrapped_tool_function(**kwargs):
+
+            return self.run_tool(name, tool_function, **kwargs)
+
+        return wrapped_tool_function
+
+    def run_tool(self, name: str, tool_function, **kwargs):
+
+        page_state = self.get_page_state() if name not in self.read_only_tools else None
+        refresh_count = self.refresh_count
+
+        result = tool_function(**kwargs)
+
+        #only a refresh during the tool shows what the action changed; deferred refreshes are reported by the last tool of the batch
+        if page_state is not None and self.refresh_count != refresh_count:
+
+            page_diff = self.describe_page_changes(page_state)
+
+            if page_diff:
+
+                result = str(result) + "\n" + page_diff
+
+        if self.action_tracer is not None and name in RECORDED_TOOLS and str(result).startswith("Successfully"):
+
+            self.action_tracer.record(self.page_signature, self.current_url, name, kwargs)
+
+        if name in PAGE_CHANGING_TOOLS:
+
+            page_report = self.on_page_changed()
+
+            if page_report:
+
+                result = str(result) + "\n" + page_report
+
+        return result
+
+    def on_page_changed(self) -> str:
+
+        reports = []
+
+        if self.action_tracer is not None:
+
+            reports.append(self.update_page_trace())
+
+        if self.field_matcher is not None:
+
+            reports.append(self.autofill_text_inputs())
+
+        return "\n".join(report for report in reports if report)
+
+    def autofill_text_inputs(self) -> str:
+
+        candidates = [key for key in self.text_input_elements if key not in self.filled_text_inputs]
+
+        if len(candidates) == 0:
+
+            return ""
+
+        matches = {}
+
+        for key in candidates:
+
+            match = self.field_matcher.match(key)
+
+            if match is not None:
+
+                matches[key] = match[1]
+
+        report = self.fill_text_inputs(matches) if len(matches) > 0 else {}
+
+        filled = [key for key, result in report.items() if result.startswith("Successfully")]
+
+        form_key = f"{self.current_url}\n" + "\n".join(sorted(self.text_input_elements))
+
+        form_report = self.autofill_forms.get(form_key)
+
+        #each field filled here is an Enter-Text call the agent no longer has to make
+        if form_report is None:
+
+            form_report = {"url": self.current_url, "fields": len(candidates), "matched": 0, "match_rate": 0.0, "llm_iterations_avoided": 0}
+
+            self.autofill_forms[form_key] = form_report
+            self.autofill_reports.append(form_report)
+
+        #fields filled earlier are no longer candidates, so only newly filled ones are added
+        form_report["matched"] += len(filled)
+        form_report["llm_iterations_avoided"] += len(filled)
+        form_report["match_rate"] = form_report["matched"] / form_report["fields"]
+
+        if self.verbose:
+
+            print(f"Autofilled {form_report['matched']} of {form_report['fields']} text input field(s) ({form_report['match_rate']:.0%} match rate).")
+
+        if len(filled) == 0:
+
+            return ""
+
+        return f"Automatically filled {len(filled)} text input field(s) from the applicant profile: {', '.join(filled)}. Use Get-Text-Input-Elements to see the fields that still need to be filled out."
+
+    def update_page_trace(self) -> str:
+
+        signature = self.action_tracer.get_form_signature(self.current_url, self.get_registries())
+
+        if signature == self.page_signature:
+
+            return ""
+
+        #the previous form is finished, so its trace can be written
+        if self.page_signature is not None:
+
+            self.action_tracer.flush(self.page_signature)
+
+        self.page_signature = signature
+
+        return self.replay_form_trace()
+
+    def replay_form_trace(self) -> str:
+
+        trace = self.action_tracer.load(self.page_signature)
+
+        if trace is None:
+
+            return ""
+
+        reports = []
+
+        replayed_actions, divergence = self.replay_trace(trace)
+
+        if len(replayed_actions) > 0:
+
+            reports.append(f"Replayed {len(replayed_actions)} recorded action(s) on this form.")
+
+        #replay never clicks, so it always ends on this form; the agent's actions continue the replayed part of the trace
+        self.action_tracer.restart_recording(self.page_signature, self.current_url, replayed_actions)
+
+        if divergence is not None:
+
+            reports.append(f"Replay stopped: {divergence} Continue filling out the form from here.")
+
+        if self.verbose and reports:
+
+            print("\n".join(reports))
+
+        return "\n".join(reports)
+
+    def replay_trace(self, trace: dict) -> tuple:
+
+        replayed_actions = []
+
+        self.replaying = True
+
+        try:
+
+            for action in trace["actions"]:
+
+                if action["tool"] in REPLAY_STOP_TOOLS:
+
+                    return replayed_actions, f"the recorded form continues with '{action['tool']}', which is left to you. Check the form before clicking."
+
+                unmapped = self.action_tracer.get_unmapped_values(action)
+
+                if unmapped:
+
+                    return replayed_actions, f"'{action['tool']}' was recorded with values that are not in the applicant profile ({', '.join(unmapped)})."
+
+                args = self.action_tracer.resolve_args(action)
+
+                if args is None:
+
+                    return replayed_actions, f"the applicant profile has no value for a field used by '{action['tool']}'."
+
+                result = str(self.tool_functions[action["tool"]](**args))
+
+                if not result.startswith("Successfully"):
+
+                    return replayed_actions, result
+
+                replayed_actions.append(action)
+
+        finally:
+
+            self.replaying = False
+
+        return replayed_actions, None
+
+    def flush_action_trace(self) -> None:
+
+        if self.action_tracer is not None:
+
+            self.action_tracer.flush()
+
+    def get_registries(self) -> dict:
+
+        return {
+            "text_input_elements": self.text_input_elements,
+            "buttons": self.buttons,
+            "href_links": self.href_links,
+            "select_elements": self.select_elements,
+            "file_upload_elements": self.file_upload_elements
+        }
+
+    def create_tool_coroutine(self, tool_function):
+
+        async def tool_coroutine(**kwargs):
+
+            return await self.blocking_executor.run(self.call_with_driver_lock, tool_function, **kwargs)
+
+        return tool_coroutine
+
+    def call_with_driver_lock(self, tool_function, **kwargs):
+
+        with self.driver_lock:
+
+            return tool_function(**kwargs)
+
     def get_tools(self) -> list[StructuredTool]:
 
         return self.tools
@@ -150,187 +558,577 @@ class SeleniumEngine():
     def navigate_to_url(self, url: str) -> None:
         """Navigate to the provided URL. URL must be fully complete with http or https."""
         
+        start_time = time.perf_counter()
+
         self.webdriver.get(url)
 
-        self.update_elements()
+        if self.tracer is not None:
+
+            self.tracer.add_span("page_load", "selenium", start_time, time.perf_counter(), {"url": url})
+
+        self.settle_page("Navigate-to-URL")
 
         return "Successfully navigated to URL: " + url
 
-    def update_elements(self) -> None:
-        
-        self.text_input_elements = self.extract_input_fields()
-        self.buttons = self.extract_buttons()
-        self.href_links = self.extract_href_links()
-        self.select_elements = self.extract_select_elements()
-        self.file_upload_elements = self.extract_file_uploads()
+    def settle_page(self, action: str) -> dict:
+
+        if self.refresh_deferred and action not in PAGE_CHANGING_TOOLS:
+
+            self.deferred_actions.append(action)
+
+            return None
+
+        self.deferred_actions = []
+
+        start_time = time.perf_counter()
+
+        report = self.readiness.wait(self.webdriver, expect_changes=action in PAGE_CHANGING_TOOLS)
+
+        report["action"] = action
+
+        self.settle_reports.append(report)
+
+        if self.tracer is not None:
+
+            self.tracer.add_span("settle", "selenium", start_time, time.perf_counter(), {
+                "action": action,
+                "settled": report["settled"],
+                "polls": report["polls"],
+                "timeout": report["timeout"]
+            })
+
+        if self.verbose:
+
+            if report["settled"]:
+
+                print(f"Page settled {report['seconds']:.2f}s after {action} ({report['polls']} polls).")
+
+            else:
+
+                print(f"Page did not settle within {report['timeout']:.2f}s after {action}; refreshing elements anyway.")
+
+        #the one element refresh of the action, now that the page has settled
+        self.update_elements()
+
+        return report
+
+    def begin_deferred_refresh(self) -> None:
+
+        self.refresh_deferred = True
+        self.deferred_actions = []
+
+    def release_deferred_refresh(self) -> None:
+
+        #the next action settles and refreshes as usual, which covers the actions deferred before it
+        self.refresh_deferred = False
+
+    def end_deferred_refresh(self) -> None:
+
+        self.refresh_deferred = False
+
+        #one settle and refresh for every deferred action of the batch
+        if self.deferred_actions:
+
+            self.settle_page(", ".join(dict.fromkeys(self.deferred_actions)))
+
+    @contextmanager
+    def deferred_refresh(self):
+
+        self.begin_deferred_refresh()
+
+        try:
+
+            yield
+
+        finally:
+
+            self.end_deferred_refresh()
+
+    def get_settle_stats(self) -> dict:
+
+        if len(self.settle_reports) == 0:
+
+            return {}
+
+        return {
+            "actions": len(self.settle_reports),
+            "unsettled": sum(1 for report in self.settle_reports if not report["settled"]),
+            "total_seconds": sum(report["seconds"] for report in self.settle_reports),
+            "max_seconds": max(report["seconds"] for report in self.settle_reports),
+            "polls": sum(report["polls"] for report in self.settle_reports)
+        }
+
+    def get_text_stats(self) -> dict:
+
+        if len(self.text_reports) == 0:
+
+            return {}
+
+        return {
+            "extractions": len(self.text_reports),
+            "text_tokens": sum(report["text_tokens"] for report in self.text_reports),
+            "raw_tokens": sum(report["raw_tokens"] for report in self.text_reports),
+            "saved_tokens": sum(report["saved_tokens"] for report in self.text_reports)
+        }
+
+    def update_elements(self, categories: list = None, force: bool = False) -> None:
+
+        start_time = time.perf_counter()
+        round_trips_before = self.round_trips
+
+        snapshot = self.webdriver.execute_script(SNAPSHOT_SCRIPT, ELEMENT_CATEGORIES, categories, force, ELEMENT_ID_ATTRIBUTE)
+
+        #text inputs filled on a previous page do not carry over
+        if snapshot["url"] != self.current_url:
+
+            self.filled_text_inputs = set()
+
+        self.current_url = snapshot["url"]
+
+        for category, entries in snapshot["categories"].items():
+
+            #headings and messages are only of interest for their text
+            if category in TEXT_CATEGORIES:
+
+                entries = [entry for entry in entries if self.get_text_key(entry["attrs"])]
+
+            keyed_entries = self.assign_keys(category, entries)
+
+            #a multi-step form can reuse a key for a later step's field, or re-render its fields empty, without changing the URL
+            if category == "text_input_elements":
+
+                self.filled_text_inputs = {
+                    key for key, entry in keyed_entries
+                    if key in self.filled_text_inputs and self.text_input_ids.get(key) == entry["id"] and entry["attrs"].get("value")
+                }
+
+                self.text_input_ids = {key: entry["id"] for key, entry in keyed_entries}
+
+            if category == "select_elements":
+
+                registry = {key: {"options": entry["options"], "element": entry["element"]} for key, entry in keyed_entries}
+
+            else:
+
+                registry = {key: entry["element"] for key, entry in keyed_entries}
+
+            setattr(self, category, registry)
+
+            self.element_locators[category] = {key: self.build_locator(category, entry) for key, entry in keyed_entries}
+            self.element_sections[category] = {key: entry.get("section") for key, entry in keyed_entries}
+
+        #page text extracted before this refresh may be out of date
+        self.text_pages = []
+
+        self.refresh_count += 1
+        self.last_refresh_round_trips = self.round_trips - round_trips_before
+
+        refreshed = "all" if snapshot["full"] else ", ".join(snapshot["categories"].keys()) or "none"
+
+        if self.tracer is not None:
+
+            self.tracer.add_span("update_elements", "selenium", start_time, time.perf_counter(), {
+                "round_trips": self.last_refresh_round_trips,
+                "refreshed": refreshed
+            })
+
+        if self.verbose:
+
+            print(f"Refreshed page elements ({refreshed}) in {self.last_refresh_round_trips} WebDriver round-trip(s).")
+
+    def count_round_trips(self) -> None:
+
+        #pooled drivers are reused by several engines, so always wrap the original execute
+        execute = getattr(self.webdriver, "uncounted_execute", self.webdriver.execute)
+
+        self.webdriver.uncounted_execute = execute
+
+        def counted_execute(*args, **kwargs):
+
+            self.round_trips += 1
+
+            return execute(*args, **kwargs)
+
+        self.webdriver.execute = counted_execute
+
+    def get_round_trip_stats(self) -> dict:
+
+        return {
+            "round_trips": self.round_trips,
+            "refreshes": self.refresh_count,
+            "last_refresh_round_trips": self.last_refresh_round_trips
+        }
 
     def format_element_key(self, key: str) -> str:
 
+        if key is None:
+
+            return ""
+
         return key.strip(" \n\t").replace(" ", "-").replace("\n", "-").replace("\t", "-")
-    
-    def extract_input_fields(self) -> dict:
 
-        text_input_elements = self.webdriver.find_elements(By.XPATH, "//input[@type='text']")
+    def assign_keys(self, category: str, entries: list) -> list:
+
+        #returns (key, entry) pairs in document order; elements without a name are keyed by their element id,
+        #and repeated keys get a -2, -3, ... suffix so that no element is hidden by another
+        keyed_entries = []
+        used_keys = set()
+
+        for entry in entries:
+
+            base_key = self.key_functions[category](entry["attrs"]) or f"{ELEMENT_CATEGORIES[category]['label']}-{entry['id']}"
+
+            key = base_key
+            suffix = 1
+
+            while key in used_keys:
+
+                suffix += 1
+                key = f"{base_key}-{suffix}"
+
+            used_keys.add(key)
+            keyed_entries.append((key, entry))
+
+        return keyed_entries
+
+    def build_locator(self, category: str, entry: dict) -> dict:
+
+        selector = ELEMENT_CATEGORIES[category]["selector"]
+
+        #the stamped id first, then the element's own id and name in case a re-render dropped the stamp
+        selectors = [f"{selector}[{ELEMENT_ID_ATTRIBUTE}={json.dumps(entry['id'])}]"]
+
+        for attribute in ["id", "name"]:
+
+            if entry["attrs"].get(attribute):
+
+                selectors.append(f"{selector}[{attribute}={json.dumps(entry['attrs'][attribute])}]")
+
+        return {"id": entry["id"], "selectors": selectors}
+
+    def get_element(self, category: str, key: str):
 
-        #filter non-displayed elements
-        text_input_elements = [element for element in text_input_elements if element.is_displayed()]
+        element = getattr(self, category)[key]
 
-        element_dict = {self.get_text_input_key(element): element for element in text_input_elements}
+        return element["element"] if category == "select_elements" else element
 
-        if '' in element_dict:
+    def resolve_element(self, category: str, key: str):
 
-            del element_dict['']
+        locator = self.element_locators[category].get(key)
 
-        return element_dict
+        element = self.webdriver.execute_script(RESOLVE_SCRIPT, locator["selectors"], locator["id"], ELEMENT_ID_ATTRIBUTE) if locator is not None else None
+
+        if element is None:
+
+            #the element is gone or ambiguous, so only a rebuild can tell what the key refers to now
+            self.update_elements(force=True)
+
+            return self.get_element(category, key)
+
+        if category == "select_elements":
+
+            self.select_elements[key]["element"] = element
+
+        else:
+
+            getattr(self, category)[key] = element
+
+        if self.verbose:
+
+            print(f"Re-resolved stale element '{key}' in one WebDriver round-trip.")
+
+        return element
+
+    def with_element(self, category: str, key: str, action):
+
+        #runs action on the element of a key, re-resolving the element once if its handle went stale; raises KeyError for unknown keys
+        try:
+
+            return action(self.get_element(category, key))
+
+        except StaleElementReferenceException:
+
+            return action(self.resolve_element(category, key))
     
-    def get_text_input_key(self, element) -> str:
+    def get_text_key(self, attrs: dict) -> str:
+
+        return " ".join((attrs.get("innerText") or "").split())[:200]
+
+    def get_page_state(self) -> dict:
+
+        return {"url": self.current_url, "registries": {category: list(getattr(self, category).keys()) for category in ELEMENT_CATEGORIES}}
 
-        if element.get_attribute("placeholder"):
+    def describe_page_changes(self, before: dict, item_limit: int = 10) -> str:
 
-            key = element.get_attribute("placeholder")
+        after = self.get_page_state()
 
-        elif element.get_attribute("name"):
+        def format_items(items: list) -> str:
 
-            key = element.get_attribute("name")
+            shown = ", ".join(items[:item_limit])
 
-        elif element.get_attribute("value"):
+            return shown + (f", ... ({len(items) - item_limit} more)" if len(items) > item_limit else "")
 
-            rkey = element.get_attribute("value")
+        labels = {
+            "text_input_elements": "text inputs", "select_elements": "select elements", "file_upload_elements": "file uploads",
+            "buttons": "buttons", "href_links": "links", "headings": "headings"
+        }
+
+        #a new page is summarized rather than diffed, since everything on it is new
+        if after["url"] != before["url"]:
+
+            counts = ", ".join(f"{len(after['registries'][category])} {label}" for category, label in labels.items() if category != "headings" and after["registries"][category])
+
+            lines = [f"The page changed to {after['url']} ({counts or 'no interactive elements'}). Use Get-Page-Overview to see its elements."]
+
+            if after["registries"]["headings"]:
+
+                lines.append("Headings: " + format_items(after["registries"]["headings"]))
 
         else:
 
-            key = element.get_attribute("id")
+            lines = []
 
-        return self.format_element_key(key)
+            for category, label in labels.items():
+
+                before_keys = set(before["registries"][category])
+
+                added = [key for key in after["registries"][category] if key not in before_keys]
+                removed = [key for key in before["registries"][category] if key not in set(after["registries"][category])]
+
+                if added:
+
+                    lines.append(f"+ {label}: {format_items(added)}")
+
+                if removed:
+
+                    lines.append(f"- {label}: {format_items(removed)}")
+
+            if lines:
+
+                lines.insert(0, "Page changes (+ appeared, - disappeared):")
+
+        new_messages = [message for message in after["registries"]["messages"] if message not in set(before["registries"]["messages"]) or after["url"] != before["url"]]
+
+        if new_messages:
+
+            lines.append("New messages on the page: " + " | ".join(new_messages[:item_limit]))
+
+        return "\n".join(lines)
+
+    def get_checkpoint_state(self) -> dict:
+
+        #the page an interrupted application resumes from, and the values already entered on it
+        entries = [["text_input_elements", key, element] for key, element in self.text_input_elements.items()]
+        entries += [["select_elements", key, select["element"]] for key, select in self.select_elements.items()]
+
+        try:
+
+            form_values = self.webdriver.execute_script(FORM_VALUES_SCRIPT, entries) if entries else {}
+
+        except WebDriverException:
+
+            form_values = {}
+
+        return {"url": self.current_url, "form_values": form_values}
+
+    def restore_checkpoint_state(self, state: dict) -> list:
+
+        #returns the keys of the elements whose values were entered again
+        self.navigate_to_url(state["url"])
+
+        form_values = state.get("form_values", {})
+
+        restored = []
+
+        text_values = {key: value for key, value in form_values.get("text_input_elements", {}).items() if key in self.text_input_elements}
+
+        if text_values:
 
-    def extract_buttons(self) -> dict:
+            report = self.fill_text_inputs(text_values)
 
-        buttons = self.webdriver.find_elements(By.XPATH, "//button")
+            restored.extend(key for key, result in report.items() if result.startswith("Successfully"))
 
-        #filter non-displayed elements
-        buttons = [button for button in buttons if button.is_displayed()]
+        for key, value in form_values.get("select_elements", {}).items():
 
-        element_dict = {self.get_button_key(button): button for button in buttons}
+            if self.set_select_element_option(key, value).startswith("Successfully"):
 
-        if '' in element_dict:
+                restored.append(key)
 
-            del element_dict['']
+        return restored
 
-        return element_dict
+    def get_text_input_key(self, attrs: dict) -> str:
 
-    def get_button_key(self, button) -> str:
+        if attrs.get("placeholder"):
 
-        if button.get_attribute("text"):
+            key = attrs.get("placeholder")
 
-            key = button.get_attribute("text")
+        elif attrs.get("name"):
+
+            key = attrs.get("name")
+
+        elif attrs.get("value"):
+
+            key = attrs.get("value")
 
         else:
 
-            key = button.get_attribute("id")
+            key = attrs.get("id")
 
         return self.format_element_key(key)
 
-    def extract_href_links(self) -> dict:
+    def get_button_key(self, attrs: dict) -> str:
 
-        href_links = self.webdriver.find_elements(By.XPATH, "//a")
+        if attrs.get("text"):
 
-        #filter non-displayed elements
-        href_links = [link for link in href_links if link.is_displayed()]
-        
-        element_dict = {self.get_link_key(link): link for link in href_links}
+            key = attrs.get("text")
 
-        if '' in element_dict:
+        else:
 
-            del element_dict['']
+            key = attrs.get("id")
 
-        return element_dict
+        return self.format_element_key(key)
 
-    def get_link_key(self, link) -> str:
+    def get_link_key(self, attrs: dict) -> str:
 
-        if link.get_attribute("text"):
+        if attrs.get("text"):
 
-            key = link.get_attribute("text")
+            key = attrs.get("text")
 
-        elif link.get_attribute("name"):
+        elif attrs.get("name"):
 
-            key = link.get_attribute("name")
+            key = attrs.get("name")
 
-        elif link.get_attribute("href"):
+        elif attrs.get("href"):
 
-            key = link.get_attribute("href")
+            key = attrs.get("href")
 
         else:
 
-            key = link.get_attribute("id")
+            key = attrs.get("id")
 
         return self.format_element_key(key)
-
-    def extract_select_elements(self) -> dict:
+    
+    def get_select_key(self, attrs: dict) -> str:
         
-        select_elements = [Select(webElement) for webElement in self.webdriver.find_elements(By.XPATH, "//select")]
+        if attrs.get("name"):
 
-        #filter non-displayed elements
-        select_elements = [select_element for select_element in select_elements if select_element._el.is_displayed()]
+            key = attrs.get("name")
 
-        element_dict = {
-            self.get_select_key(select_element): {"options": [selElem.get_attribute("value") for selElem in select_element.options], "element": select_element} for select_element in select_elements
-            }
+        else:
 
-        if '' in element_dict:
+            key = attrs.get("id")
 
-            del element_dict['']
+        return self.format_element_key(key)
 
-        return element_dict
-    
-    def get_select_key(self, select_element: Select) -> str:
+    def get_file_upload_key(self, attrs: dict) -> str:
 
-        select_webElement = select_element._el
-        
-        if select_webElement.get_attribute("name"):
+        if attrs.get("name"):
 
-            key = select_webElement.get_attribute("name")
+            key = attrs.get("name")
 
-        elif select_webElement.get_attribute("id"):
+        else:
 
-            key = select_webElement.get_attribute("id")
+            key = attrs.get("id")
 
         return self.format_element_key(key)
     
-    def extract_file_uploads(self) -> dict:
+    def describe_element(self, category: str, key: str) -> str:
 
-        file_uploads = self.webdriver.find_elements(By.XPATH, "//input[@type='file']")
+        if category == "text_input_elements":
 
-        #filter non-displayed elements
-        file_uploads = [file_upload for file_upload in file_uploads if file_upload.is_displayed()]
+            return f"text input: {key}" + (" (filled)" if key in self.filled_text_inputs else "")
 
-        element_dict = {self.get_file_upload_key(file_upload): file_upload for file_upload in file_uploads}
+        if category == "select_elements":
 
-        if '' in element_dict:
+            options = self.select_elements[key]["options"]
 
-            del element_dict['']
+            shown = ", ".join(options[:self.overview_option_limit])
 
-        return element_dict
+            if len(options) > self.overview_option_limit:
 
-    def get_file_upload_key(self, file_upload) -> str:
+                shown += f", ... ({len(options) - self.overview_option_limit} more; use Get-Select-Element-Options)"
 
-        if file_upload.get_attribute("name"):
+            return f"select: {key} [options: {shown}]"
 
-            key = file_upload.get_attribute("name")
+        labels = {"buttons": "button", "href_links": "link", "file_upload_elements": "file upload"}
 
-        elif file_upload.get_attribute("id"):
+        return f"{labels[category]}: {key}"
 
-            key = file_upload.get_attribute("id")
+    #TOOL FUNC: Get Page Overview
+    def get_page_overview(self) -> str:
+
+        #form fields first, then the buttons and links that act on them
+        categories = ["text_input_elements", "select_elements", "file_upload_elements", "buttons", "href_links"]
+
+        sections = {}
+
+        for category in categories:
+
+            for key in getattr(self, category):
+
+                section = self.element_sections[category].get(key) or "Page"
+
+                sections.setdefault(section, []).append(self.describe_element(category, key))
+
+        if len(sections) == 0:
+
+            return "No interactive elements found on the current webpage."
+
+        lines = ["Elements on the current webpage, by form section. Use the element names with the Enter-Text, Set-Select-Element-Option, Upload-File, Click-Button and Click-HREF-Link tools."]
+
+        tokens = count_tokens(lines[0])
+        total = sum(len(descriptions) for descriptions in sections.values())
+        shown = 0
+
+        for section, descriptions in sections.items():
+
+            section_line = f"\n## {section}"
+
+            for description in descriptions:
+
+                line = f"- {description}"
+
+                tokens += count_tokens(line) + (count_tokens(section_line) if section_line else 0)
+
+                if tokens > self.text_token_budget:
+
+                    lines.append(f"\n... {total - shown} more elements omitted. Use the individual Get tools to list them.")
+
+                    return "\n".join(lines)
+
+                if section_line:
+
+                    lines.append(section_line)
+
+                    section_line = None
+
+                lines.append(line)
+                shown += 1
+
+        return "\n".join(lines)
 
-        return self.format_element_key(key)
-    
     #TOOL FUNC: Get Text Input Elements
     def get_text_input_elements(self) -> str:
 
         if len(self.text_input_elements) == 0:
 
             return "No text input elements found on the current webpage."
+
+        filled = [key for key in self.text_input_elements if key in self.filled_text_inputs]
+
+        if self.field_matcher is None or len(filled) == 0:
         
-        return ", ".join(self.text_input_elements.keys())
+            return ", ".join(self.text_input_elements.keys())
+
+        unresolved = [key for key in self.text_input_elements if key not in self.filled_text_inputs]
+
+        base_instruct = "The following text input fields have already been filled out: " + ", ".join(filled)
+
+        if len(unresolved) == 0:
+
+            return base_instruct + "\nNo other text input fields need to be filled out."
+
+        return base_instruct + "\nThe following text input fields still need to be filled out: " + ", ".join(unresolved)
 
     #TOOL FUNC: Get Buttons
     def get_buttons(self) -> str:
@@ -341,7 +1139,7 @@ class SeleniumEngine():
         
         base_instruct = "The following buttons are available. Use the Click-Button tool to click on them."
         
-        return base_instruct + "\n" ", ".join(self.buttons.keys())
+        return base_instruct + "\n" + ", ".join(self.buttons.keys())
 
     #TOOL FUNC: Get HREF Links
     def get_href_links(self) -> str:
@@ -383,37 +1181,59 @@ class SeleniumEngine():
         
         base_instruct = "The following file upload elements are available. Use the Upload-File tool to upload a file to them."
         
-        return base_instruct + "\n" + ", ".join(self.file_uploads.keys())
+        return base_instruct + "\n" + ", ".join(self.file_upload_elements.keys())
     
     #TOOL FUNC: Enter Text
     def enter_text(self, text_input_field: str, text: str) -> None:
 
+        #filled like Bulk-Enter-Text, so the text replaces the field's value instead of being appended to it
+        return self.fill_text_inputs({text_input_field: text}, action="Enter-Text")[text_input_field]
+
+    def fill_text_inputs(self, text_input_fields: dict, action: str = "Bulk-Enter-Text") -> dict:
+
+        report = {text_input_field: f"Text input field '{text_input_field}' not found on the current webpage." for text_input_field in text_input_fields}
+
+        targets = [(text_input_field, str(text)) for text_input_field, text in text_input_fields.items() if text_input_field in self.text_input_elements]
+
+        if len(targets) == 0:
+
+            return report
+
         try:
 
-            self.text_input_elements[text_input_field].send_keys(text)
+            results = self.webdriver.execute_script(FILL_SCRIPT, [[self.text_input_elements[field], text] for field, text in targets])
 
-            self.update_elements()
+        except StaleElementReferenceException:
 
-            return f"Successfully entered text '{text}' into text input field '{text_input_field}'."
+            #the page re-rendered since the last refresh, so rebuild the registry and retry once
+            self.update_elements(force=True)
 
-        except KeyError:
+            targets = [(field, text) for field, text in targets if field in self.text_input_elements]
 
-            return f"Text input field '{text_input_field}' not found on the current webpage."
+            results = self.webdriver.execute_script(FILL_SCRIPT, [[self.text_input_elements[field], text] for field, text in targets])
 
-    #TOOL FUNC: Bulk Enter Text
-    def bulk_enter_text(self, text_input_fields: str) -> None:
+        for (text_input_field, text), result in zip(targets, results):
 
-        text_input_fields_dict = json.loads(text_input_fields)
+            if result["ok"]:
 
-        bulk_enter_successes = {}
+                self.filled_text_inputs.add(text_input_field)
 
-        for text_input_field, text in text_input_fields_dict.items():
+                report[text_input_field] = f"Successfully entered text '{text}' into text input field '{text_input_field}'."
 
-            enter_text_result = self.enter_text(text_input_field, text)
+            else:
 
-            bulk_enter_successes[text_input_field] = enter_text_result
+                report[text_input_field] = f"Error entering text into text input field '{text_input_field}'. Error: {result['error']}"
 
-        self.update_elements()
+        self.settle_page(action)
+
+        return report
+
+    #TOOL FUNC: Bulk Enter Text
+    def bulk_enter_text(self, text_input_fields: str) -> None:
+
+        text_input_fields_dict = json.loads(text_input_fields)
+
+        bulk_enter_successes = self.fill_text_inputs(text_input_fields_dict)
 
         if all([result.split(" ")[0] == "Successfully" for result in bulk_enter_successes.values()]):
 
@@ -423,16 +1243,21 @@ class SeleniumEngine():
 
             base_instruct = "The following text input fields were successfully filled out: \n"
 
-            return base_instruct + "\n".join([f"{key}: {value}" for key, value in bulk_enter_successes.items() if value.split(" ")[0] == "Successfully"])
+            failed_instruct = "\nThe following text input fields could not be filled out: \n"
+
+            return (
+                base_instruct + "\n".join([f"{key}: {value}" for key, value in bulk_enter_successes.items() if value.split(" ")[0] == "Successfully"]) +
+                failed_instruct + "\n".join([f"{key}: {value}" for key, value in bulk_enter_successes.items() if value.split(" ")[0] != "Successfully"])
+            )
     
     #TOOL FUNC: Click Button
     def click_button(self, button: str) -> None:
 
         try:
 
-            self.webdriver.execute_script("arguments[0].click();", self.buttons[button])
+            self.with_element("buttons", button, lambda element: self.webdriver.execute_script("arguments[0].click();", element))
 
-            self.update_elements()
+            self.settle_page("Click-Button")
 
             return f"Successfully clicked button '{button}'."
 
@@ -445,9 +1270,9 @@ class SeleniumEngine():
 
         try:
 
-            self.webdriver.execute_script("arguments[0].click();", self.href_links[link])
+            self.with_element("href_links", link, lambda element: self.webdriver.execute_script("arguments[0].click();", element))
 
-            self.update_elements()
+            self.settle_page("Click-HREF-Link")
 
             return f"Successfully clicked link '{link}'."
 
@@ -455,10 +1280,70 @@ class SeleniumEngine():
 
             return f"Link '{link}' not found on the current webpage."
 
+    def extract_visible_text(self) -> dict:
+
+        extracted = self.webdriver.execute_script(VISIBLE_TEXT_SCRIPT)
+
+        lines = []
+        seen_lines = set()
+
+        for line in extracted["lines"]:
+
+            line = " ".join(line.split())
+
+            #repeated boilerplate (navigation, footers, repeated labels) is only kept once
+            if not line or line in seen_lines:
+
+                continue
+
+            seen_lines.add(line)
+            lines.append(line)
+
+        return {"lines": lines, "raw_tokens": estimate_tokens_from_chars(extracted["raw_length"])}
+
     #TOOL FUNC:
-    def get_all_text(self) -> str:
+    def get_all_text(self, page: int = 1) -> str:
+
+        #the first page always re-reads the document; later pages are served from that extraction
+        if page == 1 or len(self.text_pages) == 0:
+
+            extracted = self.extract_visible_text()
+
+            self.text_pages = split_into_pages(extracted["lines"], self.text_token_budget)
+            self.text_raw_tokens = extracted["raw_tokens"]
+
+            text_tokens = sum(count_tokens(text) for text in self.text_pages)
+
+            self.text_reports.append({
+                "url": self.current_url,
+                "pages": len(self.text_pages),
+                "text_tokens": text_tokens,
+                "raw_tokens": self.text_raw_tokens,
+                "saved_tokens": max(self.text_raw_tokens - text_tokens, 0)
+            })
 
-        return self.webdriver.page_source
+            if self.verbose:
+
+                print(f"Visible text is {text_tokens} tokens, {self.text_reports[-1]['saved_tokens']} fewer than the raw page source (~{self.text_raw_tokens} tokens).")
+
+        if len(self.text_pages) == 0:
+
+            return "No visible text found on the current webpage."
+
+        if page < 1 or page > len(self.text_pages):
+
+            return f"Page {page} does not exist. The current webpage text has {len(self.text_pages)} page(s)."
+
+        page_text = self.text_pages[page - 1]
+        page_tokens = count_tokens(page_text)
+
+        header = f"Page {page} of {len(self.text_pages)} ({page_tokens} tokens) of the visible text on the current webpage."
+
+        if page < len(self.text_pages):
+
+            header += f" Use the page argument to read page {page + 1}."
+
+        return header + "\n" + page_text
 
     #TOOL FUNC:
     def set_select_element_option(self, select_element: str, option: str) -> None:
@@ -467,44 +1352,54 @@ class SeleniumEngine():
 
             return f"Select element '{select_element}' not found on the current webpage."
         
-        select_element_obj = self.select_elements[select_element]["element"]
-
         try:
             
-            select_element_obj.select_by_value(option)
+            self.with_element("select_elements", select_element, lambda element: Select(element).select_by_value(option))
 
         except NoSuchElementException:
 
             return f"Option '{option}' not found for select element '{select_element}'."
 
-        self.update_elements()
+        except KeyError:
+
+            return f"Select element '{select_element}' not found on the current webpage."
+
+        self.settle_page("Set-Select-Element-Option")
 
         return f"Successfully selected option '{option}' for select element '{select_element}'."
 
     #TOOL FUNC: Upload File
     def upload_file(self, file_upload_element: str, document: str) -> None:
 
-        if file_upload_element not in self.file_uploads:
+        if file_upload_element not in self.file_upload_elements:
 
             return f"File upload element '{file_upload_element}' not found on the current webpage."
 
-        if document == "resume":
+        if document not in ["resume", "transcript"]:
 
-            file_path = self.file_upload_source_path + "resume.pdf"
+            return "Document must be either 'resume' or 'transcript'."
 
-        elif document == "transcript":
+        if self.document_resolver is not None:
 
-            file_path = self.file_upload_source_path + "transcript.pdf"
+            file_path = self.document_resolver(document)
+
+            if file_path is None:
+
+                return f"The applicant has no '{document}' document available to upload."
+
+        elif document == "resume":
+
+            file_path = self.file_upload_source_path + "resume.pdf"
 
         else:
 
-            return "Document must be either 'resume' or 'transcript'."
+            file_path = self.file_upload_source_path + "transcript.pdf"
 
         try:
 
-            self.file_uploads[file_upload_element].send_keys(file_path)
+            self.with_element("file_upload_elements", file_upload_element, lambda element: element.send_keys(file_path))
 
-            self.update_elements()
+            self.settle_page("Upload-File")
 
             return f"Successfully uploaded file '{document}' to file upload element '{file_upload_element}'."
 
@@ -0,0 +1,120 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+def measure_imports(module: str = "appbot") -> list:
+
+    #a fresh interpreter reports the cost of every import with -X importtime; the module's direct imports are kept
+    stderr = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], capture_output=True, text=True).stderr
+
+    entries = []
+
+    for line in stderr.splitlines():
+
+        if not line.startswith("import time:") or "cumulative" in line:
+
+            continue
+
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+
+        #nested imports are indented by two spaces per level
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+
+        entries.append({"name": name.strip(), "self_seconds": int(self_us) / 1e6, "cumulative_seconds": int(cumulative_us) / 1e6, "level": level})
+
+    #imports are listed after everything they import, so the module's direct imports are the level 1 entries right before it
+    rows = []
+
+    for index in range(len(entries) - 1, -1, -1):
+
+        if entries[index]["level"] == 0 and entries[index]["name"] == module:
+
+            rows.append(entries[index])
+
+            for entry in reversed(entries[:index]):
+
+                if entry["level"] == 0:
+
+                    break
+
+                if entry["level"] == 1:
+
+                    rows.append(entry)
+
+            break
+
+    return sorted(rows, key=lambda row: row["cumulative_seconds"], reverse=True)
+
+def measure_startup(repeat: int = 2, launch_browser: bool = False) -> list:
+
+    rows = []
+
+    start_time = time.perf_counter()
+
+    from appbot import AppBot
+    from applicant_profile import ApplicantProfile
+    from selenium_engine import SeleniumEngine
+    from profile_store import FilesystemProfileStore
+    from scripted_chat_model import ScriptedChatModel
+    from benchmark import BENCHMARK_DIR
+
+    rows.append({"name": "import appbot", "seconds": time.perf_counter() - start_time})
+
+    profile_store = FilesystemProfileStore(os.path.join(BENCHMARK_DIR, "applicants"))
+
+    #the first construction builds the shared tool schemas; later ones reuse them
+    for attempt in range(1, repeat + 1):
+
+        start_time = time.perf_counter()
+        SeleniumEngine()
+        rows.append({"name": f"SeleniumEngine() #{attempt}", "seconds": time.perf_counter() - start_time})
+
+        start_time = time.perf_counter()
+        ApplicantProfile("bench_applicant", profile_store=profile_store)
+        rows.append({"name": f"ApplicantProfile() #{attempt}", "seconds": time.perf_counter() - start_time})
+
+        start_time = time.perf_counter()
+        appbot = AppBot(applicant_id="bench_applicant", profile_store=profile_store, llm=ScriptedChatModel(script=[]))
+        rows.append({"name": f"AppBot() #{attempt}", "seconds": time.perf_counter() - start_time})
+
+    if launch_browser:
+
+        start_time = time.perf_counter()
+        driver = appbot.selenium_engine.webdriver
+        rows.append({"name": "browser launch (first tool call)", "seconds": time.perf_counter() - start_time})
+
+        driver.quit()
+
+    return rows
+
+def format_profile(import_rows: list, startup_rows: list, top: int = 15) -> str:
+
+    lines = [f"{'import':<40} {'self ms':>9} {'cumulative ms':>14}", "-" * 65]
+
+    for row in import_rows[:top + 1]:
+
+        lines.append(f"{('  ' * row['level'] + row['name'])[:40]:<40} {1000 * row['self_seconds']:>9.1f} {1000 * row['cumulative_seconds']:>14.1f}")
+
+    lines.extend(["", f"{'startup step':<40} {'ms':>9}", "-" * 50])
+
+    for row in startup_rows:
+
+        lines.append(f"{row['name']:<40} {1000 * row['seconds']:>9.1f}")
+
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-r", "--repeat", type=int, default=2, help="Constructions per component; later ones use the cached tool schemas")
+    parser.add_argument("-t", "--top", type=int, default=15, help="Number of direct imports of appbot to list")
+    parser.add_argument("--launch-browser", action="store_true", help="Also measure the deferred browser launch")
+    args = parser.parse_args()
+
+    import_rows = measure_imports()
+
+    startup_rows = measure_startup(repeat=args.repeat, launch_browser=args.launch_browser)
+
+    print(format_profile(import_rows, startup_rows, top=args.top))
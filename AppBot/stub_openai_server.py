@@ -0,0 +1,106 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from scripted_chat_model import ScriptedChatModel
+from token_utils import count_tokens
+import argparse
+import json
+import threading
+import time
+
+class StubOpenAIServer:
+
+    def __init__(self, scripts: dict, port: int = 0, base_url: str = "") -> None:
+
+        #model name -> script in the ScriptedChatModel format; models without a script answer "Done."
+        self.models = {model: ScriptedChatModel(script=script, base_url=base_url) for model, script in scripts.items()}
+
+        #(model, step) of every request, to check which tier answered which step
+        self.requests = []
+        self.lock = threading.Lock()
+
+        server = self
+
+        class RequestHandler(BaseHTTPRequestHandler):
+
+            def log_message(self, format, *args) -> None:
+
+                pass
+
+            def do_POST(self) -> None:
+
+                request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+
+                body = json.dumps(server.complete(request)).encode()
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), RequestHandler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+
+        return f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def complete(self, request: dict) -> dict:
+
+        #answers /chat/completions in the OpenAI wire format, as the scripted model would for the same conversation
+        model = request.get("model", "")
+        step = sum(1 for message in request["messages"] if message["role"] == "assistant")
+
+        with self.lock:
+
+            self.requests.append((model, step))
+
+        message = self.models.get(model, ScriptedChatModel(script=[])).build_message(step)
+
+        tool_calls = message.additional_kwargs.get("tool_calls")
+
+        prompt_tokens = count_tokens(json.dumps(request["messages"]))
+        completion_tokens = count_tokens(json.dumps(tool_calls) if tool_calls else str(message.content))
+
+        return {
+            "id": f"chatcmpl-stub-{len(self.requests)}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": message.content or None, "tool_calls": tool_calls} if tool_calls else {"role": "assistant", "content": message.content},
+                "finish_reason": "tool_calls" if tool_calls else "stop",
+                "logprobs": None
+            }],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        }
+
+    def __enter__(self):
+
+        self.thread.start()
+
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("scripts", help="JSON file mapping model names to scripts in the benchmark scenario format")
+    parser.add_argument("-p", "--port", type=int, default=8011)
+    parser.add_argument("--base-url", default="", help="Replaces {base_url} in scripted tool arguments")
+    args = parser.parse_args()
+
+    with open(args.scripts, "r") as f:
+
+        scripts = json.load(f)
+
+    with StubOpenAIServer(scripts, port=args.port, base_url=args.base_url) as server:
+
+        print(f"Serving {', '.join(scripts)} at {server.base_url}; pass --llm-base-url {server.base_url} with OPENAI_API_KEY set to any value.")
+
+        server.thread.join()
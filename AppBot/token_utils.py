@@ -0,0 +1,64 @@
+import functools
+import tiktoken
+
+#average characters per token for English text and markup, used when text is not available to encode
+CHARS_PER_TOKEN = 4
+
+@functools.lru_cache(maxsize=None)
+def get_encoding(model: str = "gpt-4o") -> tiktoken.Encoding:
+
+    try:
+
+        return tiktoken.encoding_for_model(model)
+
+    except KeyError:
+
+        return tiktoken.get_encoding("o200k_base")
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+def estimate_tokens_from_chars(char_count: int) -> int:
+
+    return char_count // CHARS_PER_TOKEN
+
+def split_line(line: str, token_budget: int, model: str = "gpt-4o") -> list:
+
+    #a line longer than a whole page is cut into page-sized token slices, so no page goes over the budget
+    tokens = get_encoding(model).encode(line, disallowed_special=())
+    size = max(token_budget - 1, 1)
+
+    if len(tokens) <= size:
+
+        return [line]
+
+    return [get_encoding(model).decode(tokens[start:start + size]) for start in range(0, len(tokens), size)]
+
+def split_into_pages(lines: list, token_budget: int, model: str = "gpt-4o") -> list:
+
+    pages = []
+    page_lines = []
+    page_tokens = 0
+
+    lines = [piece for line in lines for piece in split_line(line, token_budget, model)]
+
+    for line in lines:
+
+        line_tokens = count_tokens(line, model) + 1
+
+        if page_lines and page_tokens + line_tokens > token_budget:
+
+            pages.append("\n".join(page_lines))
+
+            page_lines = []
+            page_tokens = 0
+
+        page_lines.append(line)
+        page_tokens += line_tokens
+
+    if page_lines:
+
+        pages.append("\n".join(page_lines))
+
+    return pages
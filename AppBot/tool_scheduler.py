@@ -0,0 +1,190 @@
+from contextlib import nullcontext
+from typing import Any
+from langchain.agents import AgentExecutor
+from langchain_core.agents import AgentAction
+import asyncio
+
+class StepSchedule:
+
+    def __init__(self) -> None:
+
+        #actions of one agent step in the order the LLM gave them, and their steps once run
+        self.actions = []
+        self.steps = None
+        self.task = None
+
+    def index(self, agent_action: AgentAction) -> int:
+
+        for index, action in enumerate(self.actions):
+
+            if action is agent_action:
+
+                return index
+
+        return None
+
+class SchedulingAgentExecutor(AgentExecutor):
+
+    #refreshes after mutating tools are deferred on this engine until the last mutating tool of a step has run
+    selenium_engine: Any = None
+
+    schedule: Any = None
+
+    def is_read_only(self, name_to_tool_map: dict, agent_action: AgentAction) -> bool:
+
+        tool = name_to_tool_map.get(agent_action.tool)
+
+        return tool is not None and bool((tool.metadata or {}).get("read_only"))
+
+    def group_actions(self, name_to_tool_map: dict) -> list:
+
+        #runs of adjacent read-only or mutating calls, in the order the LLM gave them
+        groups = []
+
+        for index, action in enumerate(self.schedule.actions):
+
+            read_only = self.is_read_only(name_to_tool_map, action)
+
+            if groups and groups[-1][0] == read_only:
+
+                groups[-1][1].append(index)
+
+            else:
+
+                groups.append((read_only, [index]))
+
+        return groups
+
+    def release_on_last_action(self, position: int, count: int) -> None:
+
+        #the last mutating call refreshes itself, so its result can describe what the whole batch changed on the page
+        if self.selenium_engine is not None and position == count - 1:
+
+            self.selenium_engine.release_deferred_refresh()
+
+    def _iter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager = None):
+
+        #the default implementation announces every action of a step before performing any of them
+        self.schedule = StepSchedule()
+
+        for output in super()._iter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+
+            if isinstance(output, AgentAction):
+
+                self.schedule.actions.append(output)
+
+            yield output
+
+    def _perform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager = None):
+
+        index = self.schedule.index(agent_action) if self.schedule is not None else None
+
+        if index is None:
+
+            return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+        #the whole step runs when its first action is performed; later actions pick up their results
+        if self.schedule.steps is None:
+
+            self.schedule.steps = self.run_schedule(name_to_tool_map, color_mapping, run_manager)
+
+        return self.schedule.steps[index]
+
+    def perform_action(self, name_to_tool_map, color_mapping, agent_action, run_manager = None):
+
+        return super()._perform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+    def run_schedule(self, name_to_tool_map, color_mapping, run_manager = None) -> list:
+
+        actions = self.schedule.actions
+        steps = [None] * len(actions)
+
+        for read_only, indices in self.group_actions(name_to_tool_map):
+
+            #read-only calls share the WebDriver session, so they run one at a time
+            if read_only:
+
+                for index in indices:
+
+                    steps[index] = self.perform_action(name_to_tool_map, color_mapping, actions[index], run_manager)
+
+                continue
+
+            #adjacent mutating calls keep their order, with one refresh after the last of them, before any later read
+            with self.selenium_engine.deferred_refresh() if self.selenium_engine is not None else nullcontext():
+
+                for position, index in enumerate(indices):
+
+                    self.release_on_last_action(position, len(indices))
+
+                    steps[index] = self.perform_action(name_to_tool_map, color_mapping, actions[index], run_manager)
+
+        return steps
+
+    async def _aiter_next_step(self, name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager = None):
+
+        self.schedule = StepSchedule()
+
+        async for output in super()._aiter_next_step(name_to_tool_map, color_mapping, inputs, intermediate_steps, run_manager):
+
+            if isinstance(output, AgentAction):
+
+                self.schedule.actions.append(output)
+
+            yield output
+
+    async def _aperform_agent_action(self, name_to_tool_map, color_mapping, agent_action, run_manager = None):
+
+        index = self.schedule.index(agent_action) if self.schedule is not None else None
+
+        if index is None:
+
+            return await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+        #the default implementation gathers every action of a step at once; they share one scheduled run
+        if self.schedule.task is None:
+
+            self.schedule.task = asyncio.ensure_future(self.arun_schedule(name_to_tool_map, color_mapping, run_manager))
+
+        steps = await self.schedule.task
+
+        return steps[index]
+
+    async def aperform_action(self, name_to_tool_map, color_mapping, agent_action, run_manager = None):
+
+        return await super()._aperform_agent_action(name_to_tool_map, color_mapping, agent_action, run_manager)
+
+    async def arun_schedule(self, name_to_tool_map, color_mapping, run_manager = None) -> list:
+
+        actions = self.schedule.actions
+        steps = [None] * len(actions)
+
+        for read_only, indices in self.group_actions(name_to_tool_map):
+
+            if read_only:
+
+                for index in indices:
+
+                    steps[index] = await self.aperform_action(name_to_tool_map, color_mapping, actions[index], run_manager)
+
+                continue
+
+            if self.selenium_engine is not None:
+
+                self.selenium_engine.begin_deferred_refresh()
+
+            try:
+
+                for position, index in enumerate(indices):
+
+                    self.release_on_last_action(position, len(indices))
+
+                    steps[index] = await self.aperform_action(name_to_tool_map, color_mapping, actions[index], run_manager)
+
+            finally:
+
+                if self.selenium_engine is not None:
+
+                    await self.selenium_engine.blocking_executor.run(self.selenium_engine.call_with_driver_lock, self.selenium_engine.end_deferred_refresh)
+
+        return steps
@@ -0,0 +1,39 @@
+from langchain_core.pydantic_v1 import Field, create_model
+from langchain_core.utils.function_calling import convert_to_openai_tool
+import threading
+
+#tool argument models and OpenAI tool definitions are the same for every AppBot, so they are built once per process
+args_schemas = {}
+openai_tools = {}
+lock = threading.Lock()
+
+def get_args_schema(name: str, tool_args: dict) -> type:
+
+    #an argument is either a type, or a (type, default) tuple for optional arguments
+    key = (name, repr(tool_args))
+
+    with lock:
+
+        if key not in args_schemas:
+
+            pydanticified_args = {
+                description:(arg_type[0], Field(arg_type[1], description=description)) if isinstance(arg_type, tuple) else (arg_type, Field(description=description))
+                for (description, arg_type) in tool_args.items()
+            }
+
+            args_schemas[key] = create_model("Model", **pydanticified_args)
+
+        return args_schemas[key]
+
+def get_openai_tools(tools: list) -> list:
+
+    #the same definitions bind_tools would send, keyed by what they are built from
+    key = tuple((tool.name, tool.description, tool.args_schema) for tool in tools)
+
+    with lock:
+
+        if key not in openai_tools:
+
+            openai_tools[key] = [convert_to_openai_tool(tool) for tool in tools]
+
+        return openai_tools[key]
@@ -0,0 +1,231 @@
+from contextlib import contextmanager
+from langchain_core.callbacks import BaseCallbackHandler
+from token_utils import count_tokens
+import json
+import os
+import threading
+import time
+
+#numeric span attributes that are summed in the summary table
+SUMMED_ATTRIBUTES = ["round_trips", "tokens_in", "tokens_out", "observation_chars"]
+
+class Tracer:
+
+    def __init__(self) -> None:
+
+        self.spans = []
+        self.lock = threading.Lock()
+
+        #span times are reported relative to the tracer's creation
+        self.origin = time.perf_counter()
+
+    def add_span(self, name: str, category: str, start: float, end: float, attributes: dict = None) -> None:
+
+        span = {
+            "name": name,
+            "category": category,
+            "start": start - self.origin,
+            "duration": end - start,
+            "thread": threading.get_ident(),
+            "attributes": attributes if attributes is not None else {}
+        }
+
+        with self.lock:
+
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, category: str, **attributes):
+
+        start = time.perf_counter()
+
+        try:
+
+            #callers may add attributes to the yielded dict while the span is open
+            yield attributes
+
+        finally:
+
+            self.add_span(name, category, start, time.perf_counter(), attributes)
+
+    def write_jsonl(self, path: str) -> None:
+
+        with open(path, "w") as f:
+
+            for span in self.spans:
+
+                f.write(json.dumps(span) + "\n")
+
+    def write_chrome_trace(self, path: str) -> None:
+
+        #the Trace Event Format read by chrome://tracing and Perfetto
+        events = [
+            {
+                "name": span["name"],
+                "cat": span["category"],
+                "ph": "X",
+                "ts": span["start"] * 1e6,
+                "dur": span["duration"] * 1e6,
+                "pid": os.getpid(),
+                "tid": span["thread"],
+                "args": span["attributes"]
+            }
+            for span in self.spans
+        ]
+
+        with open(path, "w") as f:
+
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def summarize(self) -> list:
+
+        rows = {}
+
+        for span in self.spans:
+
+            row = rows.setdefault((span["category"], span["name"]), {"category": span["category"], "name": span["name"], "count": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+
+            row["count"] += 1
+            row["total_seconds"] += span["duration"]
+            row["max_seconds"] = max(row["max_seconds"], span["duration"])
+
+            for attribute in SUMMED_ATTRIBUTES:
+
+                if isinstance(span["attributes"].get(attribute), (int, float)):
+
+                    row[attribute] = row.get(attribute, 0) + span["attributes"][attribute]
+
+        return sorted(rows.values(), key=lambda row: row["total_seconds"], reverse=True)
+
+    def format_summary(self) -> str:
+
+        header = f"{'category':<10} {'name':<28} {'count':>6} {'total s':>9} {'mean ms':>9} {'max ms':>9} {'trips':>7} {'tok in':>8} {'tok out':>8} {'obs chars':>10}"
+
+        lines = [header, "-" * len(header)]
+
+        for row in self.summarize():
+
+            lines.append(
+                f"{row['category']:<10} {row['name'][:28]:<28} {row['count']:>6} {row['total_seconds']:>9.2f} "
+                f"{1000 * row['total_seconds'] / row['count']:>9.1f} {1000 * row['max_seconds']:>9.1f} "
+                f"{row.get('round_trips', ''):>7} {row.get('tokens_in', ''):>8} {row.get('tokens_out', ''):>8} {row.get('observation_chars', ''):>10}"
+            )
+
+        return "\n".join(lines)
+
+class TracingCallbackHandler(BaseCallbackHandler):
+
+    def __init__(self, tracer: Tracer, selenium_engine = None) -> None:
+
+        self.tracer = tracer
+
+        #WebDriver round-trips are read from the engine's counter around each tool call
+        self.selenium_engine = selenium_engine
+
+        self.open_runs = {}
+        self.executor_run_id = None
+        self.iteration = None
+        self.iteration_count = 0
+
+    def get_round_trips(self) -> int:
+
+        return self.selenium_engine.round_trips if self.selenium_engine is not None else 0
+
+    def close_iteration(self) -> None:
+
+        if self.iteration is not None:
+
+            self.tracer.add_span(f"iteration {self.iteration_count}", "agent", self.iteration["start"], time.perf_counter(), {
+                "round_trips": self.get_round_trips() - self.iteration["round_trips"]
+            })
+
+            self.iteration = None
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id = None, **kwargs) -> None:
+
+        if parent_run_id is None:
+
+            self.executor_run_id = run_id
+
+        #every plan call of the agent executor starts a new iteration
+        elif parent_run_id == self.executor_run_id:
+
+            self.close_iteration()
+
+            self.iteration_count += 1
+            self.iteration = {"start": time.perf_counter(), "round_trips": self.get_round_trips()}
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs) -> None:
+
+        if run_id == self.executor_run_id:
+
+            self.close_iteration()
+
+    def on_chain_error(self, error, *, run_id, **kwargs) -> None:
+
+        self.on_chain_end({}, run_id=run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs) -> None:
+
+        self.open_runs[run_id] = {"start": time.perf_counter()}
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs) -> None:
+
+        self.open_runs[run_id] = {"start": time.perf_counter()}
+
+    def on_llm_end(self, response, *, run_id, **kwargs) -> None:
+
+        run = self.open_runs.pop(run_id, None)
+
+        if run is None:
+
+            return
+
+        token_usage = (response.llm_output or {}).get("token_usage", {})
+
+        model_name = (response.llm_output or {}).get("model_name", "llm")
+
+        self.tracer.add_span(model_name, "llm", run["start"], time.perf_counter(), {
+            "tokens_in": token_usage.get("prompt_tokens", 0),
+            "tokens_out": token_usage.get("completion_tokens", 0),
+            "cached": response.llm_output is None
+        })
+
+    def on_llm_error(self, error, *, run_id, **kwargs) -> None:
+
+        run = self.open_runs.pop(run_id, None)
+
+        if run is not None:
+
+            self.tracer.add_span("llm", "llm", run["start"], time.perf_counter(), {"error": str(error)})
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs) -> None:
+
+        self.open_runs[run_id] = {"start": time.perf_counter(), "name": serialized.get("name", "tool"), "round_trips": self.get_round_trips()}
+
+    def on_tool_end(self, output, *, run_id, **kwargs) -> None:
+
+        run = self.open_runs.pop(run_id, None)
+
+        if run is None:
+
+            return
+
+        observation = str(output)
+
+        self.tracer.add_span(run["name"], "tool", run["start"], time.perf_counter(), {
+            "round_trips": self.get_round_trips() - run["round_trips"],
+            "observation_chars": len(observation),
+            "observation_tokens": count_tokens(observation)
+        })
+
+    def on_tool_error(self, error, *, run_id, **kwargs) -> None:
+
+        run = self.open_runs.pop(run_id, None)
+
+        if run is not None:
+
+            self.tracer.add_span(run["name"], "tool", run["start"], time.perf_counter(), {
+                "round_trips": self.get_round_trips() - run["round_trips"],
+                "error": str(error)
+            })
@@ -0,0 +1,52 @@
+import json
+import os
+import sys
+
+APPBOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AppBot")
+
+sys.path.insert(0, APPBOT_DIR)
+
+from field_matcher import ProfileFieldMatcher
+
+class BenchProfile:
+
+    #the matcher only reads the flattened fields, so the benchmark applicant is loaded without the profile tools
+    def __init__(self) -> None:
+
+        with open(os.path.join(APPBOT_DIR, "..", "benchmarks", "applicants", "bench_applicant", "bench_applicant.json"), "r") as f:
+
+            self.applicant_json = json.load(f)
+
+    def get_flattened_fields(self, value = None, path: str = "") -> dict:
+
+        value = self.applicant_json if value is None and path == "" else value
+
+        if not isinstance(value, dict):
+
+            return {path: value}
+
+        fields = {}
+
+        for key, child in value.items():
+
+            fields.update(self.get_flattened_fields(child, f"{path}.{key}" if path else key))
+
+        return fields
+
+def test_fields_are_matched_by_name_and_synonym():
+
+    matcher = ProfileFieldMatcher(BenchProfile())
+
+    assert matcher.match("Email")[0] == "contactInfo.email"
+    assert matcher.match("Address-Line-1")[0] == "contactInfo.address.street"
+    assert matcher.match("Frist-Name")[0] == "basicInfo.firstName"
+
+def test_similar_labels_of_other_fields_are_not_matched():
+
+    matcher = ProfileFieldMatcher(BenchProfile())
+
+    #close to the synonym "email address", but an address field
+    assert matcher.match("Mailing-address") is None
+
+    #close to the synonym "address line 1", but a different line
+    assert matcher.match("Address-Line-2") is None
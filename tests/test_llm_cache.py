@@ -0,0 +1,31 @@
+import os
+import sys
+
+APPBOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "AppBot")
+
+sys.path.insert(0, APPBOT_DIR)
+
+from appbot import AppBot
+from profile_store import FilesystemProfileStore
+from stub_openai_server import StubOpenAIServer
+
+def test_second_run_is_served_from_the_llm_cache(tmp_path, monkeypatch):
+
+    monkeypatch.setenv("OPENAI_API_KEY", "stub")
+
+    profile_store = FilesystemProfileStore(os.path.join(APPBOT_DIR, "..", "benchmarks", "applicants"))
+    cache_path = str(tmp_path / "llm_cache.sqlite")
+
+    #the agent finishes on its first step, without opening a browser
+    with StubOpenAIServer({"gpt-4o": ["Done."]}) as server:
+
+        for _ in range(2):
+
+            appbot = AppBot(applicant_id="bench_applicant", profile_store=profile_store, llm_cache_path=cache_path, llm_base_url=server.base_url)
+
+            usage = appbot.invoke_agent("Fill out the job application.")
+
+        assert len(server.requests) == 1
+
+    assert usage["llm_cache_hits"] == 1
+    assert usage["llm_cache_misses"] == 0